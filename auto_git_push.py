@@ -1,29 +1,132 @@
 import os
 import sys
+import argparse
 import logging
+import logging.handlers
 from datetime import datetime
 import subprocess
 import time
-import platform
-import socket
 import configparser
-import requests
-import shutil
-import schedule
+import errno
+import fnmatch
+import glob
+import hashlib
+import heapq
+import atexit
+import io
+import json
+import queue
+import random
+import select
+import signal
+import string
+import struct
 import threading
-from pathlib import Path
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('git_push.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from collections import namedtuple
+from contextlib import contextmanager
+
+# asyncio、concurrent.futures、sqlite3、http.server、ctypes 和 requests 导入较慢，
+# 只在用到它们的函数中导入，单次运行的命令（如 config get、无变化的 push）不需要加载
+
+# 当前线程正在处理的仓库，用于在并发推送时区分日志
+_repo_context = threading.local()
+
+def _inject_repo_name(record):
+    """为日志记录附加当前仓库名（需在产生日志的线程中执行）"""
+    repo = getattr(_repo_context, 'name', '')
+    record.repo_name = repo
+    record.repo = f"[{repo}] " if repo else ''
+    return True
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(repo)s%(message)s'
+
 logger = logging.getLogger(__name__)
 
+# 异步日志的后台监听器，进程退出时停止以刷新队列
+_log_listener = None
+
+class JsonLogFormatter(logging.Formatter):
+    """以 JSON Lines 格式输出日志"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'repo': getattr(record, 'repo_name', ''),
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def _create_file_handler(log_config):
+    """按 [Log] rotate 创建按大小、按时间轮转或不轮转的文件处理器"""
+    filename = log_config['file']
+    rotate = log_config['rotate']
+    backup_count = log_config.getint('backup_count', fallback=5)
+    if rotate == 'size':
+        max_bytes = int(log_config.getfloat('max_size_mb', fallback=10) * 1024 * 1024)
+        return logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    if rotate == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            filename, when=log_config['when'], backupCount=backup_count, encoding='utf-8')
+    return logging.FileHandler(filename, encoding='utf-8')
+
+def _stop_log_listener():
+    """停止当前的日志后台线程，把队列中剩余的日志写完；进程退出时只注册一次"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+
+atexit.register(_stop_log_listener)
+
+def setup_logging(config):
+    """按 [Log] 配置初始化日志
+
+    async 模式下，推送线程只把日志放入队列，由后台线程负责格式化和写文件。
+    """
+    global _log_listener
+    log_config = config['Log']
+    
+    file_handler = _create_file_handler(log_config)
+    if log_config['format'] == 'json':
+        file_handler.setFormatter(JsonLogFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [file_handler, console_handler]
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    _stop_log_listener()
+    
+    if log_config.getboolean('async', fallback=True):
+        queue_handler = logging.handlers.QueueHandler(queue.Queue(-1))
+        queue_handler.addFilter(_inject_repo_name)
+        root.addHandler(queue_handler)
+        _log_listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _log_listener.start()
+    else:
+        for handler in handlers:
+            handler.addFilter(_inject_repo_name)
+            root.addHandler(handler)
+    root.setLevel(logging.DEBUG if log_config.getboolean('verbose', fallback=False) else logging.INFO)
+
+def truncate_lines(text, limit):
+    """最多保留 limit 行，超出部分汇总为一行"""
+    lines = text.strip().splitlines()
+    if limit <= 0 or len(lines) <= limit:
+        return '\n'.join(lines)
+    return '\n'.join(lines[:limit] + [f"... 另有 {len(lines) - limit} 行未显示"])
+
 CONFIG_FILE = 'git_config.ini'
 
 def clear_screen():
@@ -46,92 +149,199 @@ def print_menu():
     print("10. 退出")
     print("===================")
 
-def create_default_config():
-    """创建默认配置文件"""
-    config = configparser.ConfigParser()
-    config['Proxy'] = {
+# 默认配置，缺失的配置项会在加载时自动补全
+DEFAULT_CONFIG = {
+    'Proxy': {
         'enable_proxy': 'false',
         'http_proxy': 'http://127.0.0.1:7890',
         'https_proxy': 'http://127.0.0.1:7890',
         'disable_ssl_verify': 'false'
-    }
-    config['Git'] = {
+    },
+    'Git': {
         'remote_url': '',
         'branch': 'master',
-        'work_dir': os.path.dirname(os.path.abspath(__file__))
-    }
-    config['Schedule'] = {
+        'remotes': 'origin',
+        'push_branches': '',
+        'work_dir': os.path.dirname(os.path.abspath(__file__)),
+        'command_timeout': '120',
+        'push_timeout': '600',
+        'push_stall_seconds': '120',
+        'full_add_threshold': '5000'
+    },
+    'Schedule': {
         'enable': 'false',
         'interval_minutes': '60',
         'start_time': '09:00',
-        'end_time': '18:00'
-    }
-    config['Startup'] = {
+        'end_time': '18:00',
+        'mode': 'interval',
+        'debounce_seconds': '10',
+        'max_delay_seconds': '300',
+        'watch_backend': 'auto',
+        'poll_seconds': '30',
+        'jitter_seconds': '30'
+    },
+    'Startup': {
         'enable': 'false'
+    },
+    'Repos': {
+        'paths': '',
+        'glob': '',
+        'manifest': '',
+        'workers': '4'
+    },
+    'Log': {
+        'verbose': 'false',
+        'file': 'git_push.log',
+        'rotate': 'size',
+        'max_size_mb': '10',
+        'when': 'midnight',
+        'backup_count': '5',
+        'format': 'text',
+        'async': 'true',
+        'max_file_lines': '50'
+    },
+    'Batch': {
+        'enable': 'false',
+        'mode': 'commits',
+        'max_commits': '10',
+        'max_size_mb': '10',
+        'max_latency_minutes': '30'
+    },
+    'Commit': {
+        'subject': 'Auto commit at {timestamp}',
+        'body': 'Changes: {summary}\nLines: {lines}\nDirectories: {top_dirs}',
+        'max_dirs': '5',
+        'max_files': '20',
+        'max_length': '4096'
+    },
+    'Push': {
+        'verify_remote': 'false'
+    },
+    'Guard': {
+        'enable': 'true',
+        'max_file_mb': '100',
+        'max_push_mb': '0',
+        'block_binary': 'false',
+        'policy': 'skip',
+        'skip_list': ''
+    },
+    'State': {
+        'file': 'git_push_state.db'
+    },
+    'Sync': {
+        'mode': 'rebase',
+        'fetch_filter': ''
+    },
+    'Retry': {
+        'max_attempts': '3',
+        'base_seconds': '2',
+        'max_seconds': '60',
+        'backoff_seconds': '60',
+        'max_backoff_seconds': '3600'
+    },
+    'Metrics': {
+        'enable': 'false',
+        'bind': '127.0.0.1',
+        'port': '0',
+        'snapshot_file': '',
+        'snapshot_seconds': '60'
+    },
+    'Network': {
+        'probe_method': 'http',
+        'probe_url': 'https://api.github.com',
+        'probe_ttl_seconds': '300',
+        'probe_timeout': '5'
     }
-    
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        config.write(f)
-    logger.info(f"已创建默认配置文件: {CONFIG_FILE}")
-    return config
+}
 
-def load_config():
-    """加载配置文件"""
+# 进程内的配置缓存：配置对象、文件签名（mtime 和大小）以及最后一次读写的内容
+_config_lock = threading.RLock()
+_config_cache = {'config': None, 'signature': None, 'text': None}
+
+def _config_signature():
+    """返回配置文件的 (mtime, 大小)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(CONFIG_FILE)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _config_text(config):
+    """将配置序列化为文本"""
+    buffer = io.StringIO()
+    config.write(buffer)
+    return buffer.getvalue()
+
+def create_default_config():
+    """创建默认配置文件"""
     config = configparser.ConfigParser()
-    
-    if not os.path.exists(CONFIG_FILE):
-        return create_default_config()
-    
-    config.read(CONFIG_FILE, encoding='utf-8')
-    
-    # 确保所有必要的配置项都存在
-    if 'Proxy' not in config:
-        config['Proxy'] = {}
-    if 'Git' not in config:
-        config['Git'] = {}
-    if 'Schedule' not in config:
-        config['Schedule'] = {}
-    if 'Startup' not in config:
-        config['Startup'] = {}
-    
-    # 设置默认值
-    if 'enable_proxy' not in config['Proxy']:
-        config['Proxy']['enable_proxy'] = 'false'
-    if 'http_proxy' not in config['Proxy']:
-        config['Proxy']['http_proxy'] = 'http://127.0.0.1:7890'
-    if 'https_proxy' not in config['Proxy']:
-        config['Proxy']['https_proxy'] = 'http://127.0.0.1:7890'
-    if 'disable_ssl_verify' not in config['Proxy']:
-        config['Proxy']['disable_ssl_verify'] = 'false'
-    
-    if 'remote_url' not in config['Git']:
-        config['Git']['remote_url'] = ''
-    if 'branch' not in config['Git']:
-        config['Git']['branch'] = 'master'
-    if 'work_dir' not in config['Git']:
-        config['Git']['work_dir'] = os.path.dirname(os.path.abspath(__file__))
-    
-    if 'enable' not in config['Schedule']:
-        config['Schedule']['enable'] = 'false'
-    if 'interval_minutes' not in config['Schedule']:
-        config['Schedule']['interval_minutes'] = '60'
-    if 'start_time' not in config['Schedule']:
-        config['Schedule']['start_time'] = '09:00'
-    if 'end_time' not in config['Schedule']:
-        config['Schedule']['end_time'] = '18:00'
-    
-    if 'enable' not in config['Startup']:
-        config['Startup']['enable'] = 'false'
-    
-    # 保存更新后的配置
+    config.read_dict(DEFAULT_CONFIG)
     save_config(config)
+    logger.info(f"已创建默认配置文件: {CONFIG_FILE}")
     return config
 
+def load_config():
+    """加载配置文件
+
+    配置只在首次调用或文件的 mtime/大小变化时才重新解析，
+    只有补全了缺失的配置项才会写回文件。
+    """
+    with _config_lock:
+        signature = _config_signature()
+        if signature is None:
+            return create_default_config()
+        if _config_cache['config'] is not None and signature == _config_cache['signature']:
+            return _config_cache['config']
+        
+        config = configparser.ConfigParser()
+        config.read(CONFIG_FILE, encoding='utf-8')
+        _config_cache.update(config=config, signature=signature, text=_config_text(config))
+        
+        # 确保所有必要的配置项都存在
+        for section, values in DEFAULT_CONFIG.items():
+            if section not in config:
+                config[section] = {}
+            for key, value in values.items():
+                if key not in config[section]:
+                    config[section][key] = value
+        
+        # 保存更新后的配置（内容未变化时不会写盘）
+        save_config(config)
+        return config
+
 def save_config(config):
-    """保存配置文件"""
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        config.write(f)
-    logger.info("配置已保存")
+    """保存配置文件，内容未变化时跳过写入"""
+    with _config_lock:
+        text = _config_text(config)
+        if text == _config_cache['text'] and _config_cache['signature'] == _config_signature():
+            _config_cache['config'] = config
+            return
+        
+        # 先写临时文件再替换，避免写入中断时配置文件损坏
+        temp_file = CONFIG_FILE + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_file, CONFIG_FILE)
+        _config_cache.update(config=config, signature=_config_signature(), text=text)
+        logger.info("配置已保存")
+
+def repo_section(config, repo_path):
+    """返回仓库专属的配置节 [repo:<仓库名>] 或 [repo:<绝对路径>]，不存在时返回 None"""
+    if repo_path:
+        for name in (f'repo:{os.path.abspath(repo_path)}', f'repo:{repo_label(repo_path)}'):
+            if config.has_section(name):
+                return config[name]
+    return None
+
+def repo_option(config, repo_path, section, key, getter='get'):
+    """读取配置项，仓库专属配置节中的同名项优先
+
+    getter 为 SectionProxy 的读取方法名，如 'getboolean'、'getint'。
+    """
+    override = repo_section(config, repo_path)
+    if override is not None and key in override:
+        return getattr(override, getter)(key)
+    return getattr(config[section], getter)(key)
 
 def configure_work_dir():
     """配置工作目录"""
@@ -151,7 +361,7 @@ def configure_work_dir():
             # 检查并初始化Git仓库
             if not os.path.exists(os.path.join(new_dir, '.git')):
                 print("\n正在初始化Git仓库...")
-                output, error, code = run_command('git init', new_dir)
+                output, error, code = run_command(['git', 'init'], new_dir)
                 if code == 0:
                     print("Git仓库初始化成功！")
                     
@@ -165,7 +375,7 @@ def configure_work_dir():
                 print("\n目录已经是Git仓库")
                 
                 # 检查远程仓库配置
-                remote_output, _, remote_code = run_command('git remote get-url origin', new_dir)
+                remote_output, _, remote_code = run_command(['git', 'remote', 'get-url', 'origin'], new_dir)
                 
                 if remote_code != 0 and config['Git']['remote_url']:
                     # 如果本地没有远程仓库配置但配置文件中有，则添加
@@ -189,7 +399,7 @@ def configure_work_dir():
                     
                     # 初始化Git仓库
                     print("\n正在初始化Git仓库...")
-                    output, error, code = run_command('git init', new_dir)
+                    output, error, code = run_command(['git', 'init'], new_dir)
                     if code == 0:
                         print("Git仓库初始化成功！")
                         
@@ -273,8 +483,8 @@ def configure_git():
         username = input("请输入Git用户名: ").strip()
         email = input("请输入Git邮箱: ").strip()
         if username and email:
-            run_command(f'git config --global user.name "{username}"')
-            run_command(f'git config --global user.email "{email}"')
+            run_command(['git', 'config', '--global', 'user.name', username])
+            run_command(['git', 'config', '--global', 'user.email', email])
             print("Git用户信息已更新！")
     
     input("\n按回车键返回主菜单...")
@@ -311,8 +521,8 @@ def view_config():
     print(f"远程仓库: {config['Git']['remote_url']}")
     print(f"分支: {config['Git']['branch']}")
     
-    name_output, _, _ = run_command('git config --global user.name')
-    email_output, _, _ = run_command('git config --global user.email')
+    name_output, _, _ = run_command(['git', 'config', '--global', 'user.name'])
+    email_output, _, _ = run_command(['git', 'config', '--global', 'user.email'])
     print(f"Git用户名: {name_output.strip()}")
     print(f"Git邮箱: {email_output.strip()}")
     
@@ -325,6 +535,11 @@ def view_config():
     print("\n[开机自启动]")
     print(f"状态: {'启用' if config.getboolean('Startup', 'enable') else '禁用'}")
     
+    print("\n[多仓库]")
+    repo_paths = get_repo_paths(config)
+    print(f"仓库数量: {len(repo_paths)}")
+    print(f"并发数: {config['Repos']['workers']}")
+    
     input("\n按回车键返回主菜单...")
 
 def check_python_version():
@@ -339,7 +554,7 @@ def check_python_version():
 def check_git_installed():
     """检查Git是否安装"""
     try:
-        output, error, code = run_command('git --version')
+        output, error, code = run_command(['git', '--version'])
         if code == 0:
             logger.info(f"Git版本检查通过: {output.strip()}")
             return True
@@ -350,93 +565,580 @@ def check_git_installed():
         logger.error("Git未安装或不在PATH中")
         return False
 
-def check_git_config():
-    """检查Git配置"""
+def check_git_config(interactive=True):
+    """检查Git配置
+
+    interactive 为 False 时不提示输入，缺少用户名或邮箱时返回 False。
+    """
     # 检查用户名和邮箱
-    name_output, _, name_code = run_command('git config --global user.name')
-    email_output, _, email_code = run_command('git config --global user.email')
+    name_output, _, name_code = run_command(['git', 'config', '--global', 'user.name'])
+    email_output, _, email_code = run_command(['git', 'config', '--global', 'user.email'])
     
+    ok = True
     if name_code != 0 or not name_output.strip():
         logger.error("Git用户名未配置")
-        username = input("请输入Git用户名: ").strip()
-        run_command(f'git config --global user.name "{username}"')
+        if interactive:
+            username = input("请输入Git用户名: ").strip()
+            run_command(['git', 'config', '--global', 'user.name', username])
+        else:
+            ok = False
     
     if email_code != 0 or not email_output.strip():
         logger.error("Git邮箱未配置")
-        email = input("请输入Git邮箱: ").strip()
-        run_command(f'git config --global user.email "{email}"')
+        if interactive:
+            email = input("请输入Git邮箱: ").strip()
+            run_command(['git', 'config', '--global', 'user.email', email])
+        else:
+            ok = False
     
-    logger.info("Git配置检查完成")
-    return True
+    if ok:
+        logger.info("Git配置检查完成")
+    return ok
 
-def check_github_connection():
-    """检查GitHub连接"""
-    try:
-        config = load_config()
+# 复用的 HTTP 会话及其对应的代理设置
+_http_session = {'session': None, 'key': None}
+# 连接检测结果缓存：检测目标 -> (是否可连接, 检测时间)
+_connection_cache = {}
+_network_lock = threading.Lock()
+
+def get_http_session(config):
+    """获取复用连接的 requests.Session，代理和 SSL 设置变化时才重新创建"""
+    key = (
+        config.getboolean('Proxy', 'enable_proxy'),
+        config['Proxy']['http_proxy'],
+        config['Proxy']['https_proxy'],
+        config.getboolean('Proxy', 'disable_ssl_verify')
+    )
+    with _network_lock:
+        if _http_session['session'] is not None and _http_session['key'] == key:
+            return _http_session['session']
+        if _http_session['session'] is not None:
+            _http_session['session'].close()
+        
+        # requests 只在需要 HTTP 检测时才导入，避免拖慢其他命令的启动
+        import requests
+        import requests.adapters
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
         if config.getboolean('Proxy', 'enable_proxy'):
-            proxies = {
+            session.proxies.update({
                 'http': config['Proxy']['http_proxy'],
                 'https': config['Proxy']['https_proxy']
-            }
-            verify = not config.getboolean('Proxy', 'disable_ssl_verify')
-            response = requests.get('https://api.github.com', proxies=proxies, verify=verify, timeout=5)
-        else:
-            verify = not config.getboolean('Proxy', 'disable_ssl_verify')
-            response = requests.get('https://api.github.com', verify=verify, timeout=5)
-        
-        if response.status_code == 200:
-            logger.info("GitHub连接正常")
-            return True
-        else:
-            logger.error(f"GitHub连接异常: HTTP {response.status_code}")
-            return False
+            })
+        session.verify = not config.getboolean('Proxy', 'disable_ssl_verify')
+        _http_session.update(session=session, key=key)
+        return session
+
+def invalidate_connection_cache():
+    """清除连接检测缓存（推送失败后调用）"""
+    with _network_lock:
+        _connection_cache.clear()
+
+# 访问远程仓库的 git 命令使用的环境变量：(代理和 SSL 设置) -> 环境变量字典
+_git_env_cache = {}
+
+PROXY_ENV_NAMES = ('http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY')
+
+def git_network_env(config, repo_path=None):
+    """返回访问远程仓库的 git 命令（push / fetch / ls-remote）使用的环境变量
+
+    代理和 SSL 设置只通过环境变量作用于本进程启动的 git 命令，不修改全局 git 配置；
+    仓库可以在 [repo:<仓库名>] 中覆盖 [Proxy] 的各项设置。
+    git 的输出固定为英文（LC_ALL=C），以便按错误信息分类。
+    """
+    enabled = repo_option(config, repo_path, 'Proxy', 'enable_proxy', 'getboolean')
+    key = (
+        enabled,
+        repo_option(config, repo_path, 'Proxy', 'http_proxy') if enabled else None,
+        repo_option(config, repo_path, 'Proxy', 'https_proxy') if enabled else None,
+        repo_option(config, repo_path, 'Proxy', 'disable_ssl_verify', 'getboolean')
+    )
+    with _network_lock:
+        env = _git_env_cache.get(key)
+        if env is None:
+            env = dict(os.environ, LC_ALL='C', LANGUAGE='C')
+            for name in PROXY_ENV_NAMES:
+                env.pop(name, None)
+            if enabled:
+                env.update(http_proxy=key[1], HTTP_PROXY=key[1], https_proxy=key[2], HTTPS_PROXY=key[2])
+            if key[3]:
+                env['GIT_SSL_NO_VERIFY'] = 'true'
+            _git_env_cache[key] = env
+    return env
+
+def _probe_http(config, url, timeout):
+    """通过 HTTP 请求检测连接，日志中使用 probe_url 的主机名（不一定是 GitHub）"""
+    import requests
+    from urllib.parse import urlsplit
+    host = urlsplit(url).hostname or url
+    try:
+        response = get_http_session(config).get(url, timeout=timeout)
+        response.close()
     except requests.exceptions.RequestException as e:
-        logger.error(f"无法连接到GitHub: {str(e)}")
+        logger.error(f"无法连接到 {host}: {str(e)}")
         logger.info("建议配置代理或检查网络连接")
         return False
+    
+    if response.status_code == 200:
+        logger.info(f"{host} 连接正常")
+        return True
+    logger.error(f"{host} 连接异常: HTTP {response.status_code}")
+    return False
+
+def _probe_remote(config, repo_path, timeout):
+    """通过 git ls-remote 检测实际的远程仓库"""
+    _, error, code = run_command(
+        ['git', 'ls-remote', '--heads', 'origin'], repo_path, timeout=timeout, env=git_network_env(config, repo_path))
+    if code == 0:
+        logger.info("远程仓库连接正常")
+        return True
+    logger.error(f"无法连接到远程仓库: {error.strip()}")
+    logger.info("建议配置代理或检查网络连接")
+    return False
+
+def check_github_connection(repo_path=None, force=False):
+    """检查网络连接
 
-def setup_proxy():
-    """设置Git代理"""
+    [Network] probe_method 为 http 时请求 probe_url，为 ls-remote 时对仓库的 origin
+    执行 git ls-remote；结果缓存 probe_ttl_seconds 秒，force=True 时忽略缓存。
+    """
     config = load_config()
-    if config.getboolean('Proxy', 'enable_proxy'):
-        http_proxy = config['Proxy']['http_proxy']
-        https_proxy = config['Proxy']['https_proxy']
-        
-        # 设置Git代理
-        run_command(f'git config --global http.proxy {http_proxy}')
-        run_command(f'git config --global https.proxy {https_proxy}')
-        
-        # 设置环境变量代理
-        os.environ['HTTP_PROXY'] = http_proxy
-        os.environ['HTTPS_PROXY'] = https_proxy
-        
-        logger.info(f"已设置代理: {http_proxy}")
+    network = config['Network']
+    method = network['probe_method']
+    timeout = config.getfloat('Network', 'probe_timeout', fallback=5)
+    if method == 'ls-remote':
+        repo_path = repo_path or config['Git']['work_dir']
+        target = ('ls-remote', os.path.abspath(repo_path))
     else:
-        # 清除Git代理设置
-        run_command('git config --global --unset http.proxy')
-        run_command('git config --global --unset https.proxy')
-        
-        # 清除环境变量代理
-        os.environ.pop('HTTP_PROXY', None)
-        os.environ.pop('HTTPS_PROXY', None)
-        
-        logger.info("已清除代理设置")
+        target = ('http', network['probe_url'])
+    
+    ttl = config.getfloat('Network', 'probe_ttl_seconds', fallback=300)
+    with _network_lock:
+        cached = _connection_cache.get(target)
+    if cached and not force and time.monotonic() - cached[1] < ttl:
+        logger.debug(f"使用缓存的连接检测结果: {'正常' if cached[0] else '异常'}")
+        return cached[0]
+    
+    if method == 'ls-remote':
+        result = _probe_remote(config, repo_path, timeout)
+    else:
+        result = _probe_http(config, network['probe_url'], timeout)
+    
+    with _network_lock:
+        _connection_cache[target] = (result, time.monotonic())
+    return result
+
+# 运行指标：(指标名, 标签) -> 计数器数值 / 直方图数据
+_metrics = {}
+_histograms = {}
+_metrics_lock = threading.Lock()
+
+# 直方图分桶上界（耗时类指标单位为秒）
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2, 1024 ** 3)
 
-def run_command(command, cwd=None):
-    """执行命令并返回输出"""
+def repo_label(repo_path):
+    """日志和指标中使用的仓库名"""
+    return os.path.basename(os.path.normpath(os.path.abspath(repo_path)))
+
+def inc_metric(name, value=1, **labels):
+    """累加计数器指标"""
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        _metrics[key] = _metrics.get(key, 0) + value
+
+def observe_metric(name, value, buckets=HISTOGRAM_BUCKETS, **labels):
+    """记录一次直方图观测值"""
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'bounds': buckets, 'buckets': [0] * len(buckets), 'sum': 0, 'count': 0}
+        for index, bound in enumerate(histogram['bounds']):
+            if value <= bound:
+                histogram['buckets'][index] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+@contextmanager
+def stage_timer(repo_path, stage):
+    """统计推送流程中某个阶段的耗时"""
+    start = time.monotonic()
     try:
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-            cwd=cwd
-        )
-        output, error = process.communicate()
-        return output.decode('utf-8'), error.decode('utf-8'), process.returncode
-    except Exception as e:
+        yield
+    finally:
+        observe_metric('stage_duration_seconds', time.monotonic() - start, repo=repo_label(repo_path), stage=stage)
+
+def record_stage_failure(repo_path, stage):
+    """记录某个阶段的失败次数"""
+    inc_metric('stage_failures_total', repo=repo_label(repo_path), stage=stage)
+
+def _format_labels(labels):
+    """格式化 Prometheus 标签，转义反斜杠、引号和换行"""
+    if not labels:
+        return ''
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+def render_metrics():
+    """以 Prometheus 文本格式输出所有指标"""
+    with _metrics_lock:
+        counters = sorted(_metrics.items())
+        histograms = sorted((key, dict(value, buckets=list(value['buckets']))) for key, value in _histograms.items())
+    
+    lines = []
+    declared = set()
+    for (name, labels), value in counters:
+        full_name = f'autopush_{name}'
+        if full_name not in declared:
+            declared.add(full_name)
+            lines.append(f'# TYPE {full_name} counter')
+        lines.append(f'{full_name}{_format_labels(labels)} {value:g}')
+    for (name, labels), histogram in histograms:
+        full_name = f'autopush_{name}'
+        if full_name not in declared:
+            declared.add(full_name)
+            lines.append(f'# TYPE {full_name} histogram')
+        cumulative = 0
+        for bound, count in zip(histogram['bounds'], histogram['buckets']):
+            cumulative += count
+            lines.append(f'{full_name}_bucket{_format_labels(labels + (("le", f"{bound:g}"),))} {cumulative}')
+        lines.append(f'{full_name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+        lines.append(f'{full_name}_sum{_format_labels(labels)} {histogram["sum"]:g}')
+        lines.append(f'{full_name}_count{_format_labels(labels)} {histogram["count"]}')
+    pushes = active_push_snapshots()
+    for field, name in (('bytes', 'bytes'), ('objects', 'objects'), ('idle', 'idle_seconds')):
+        full_name = f'autopush_push_progress_{name}'
+        if pushes:
+            lines.append(f'# TYPE {full_name} gauge')
+        for push in pushes:
+            labels = (('remote', push['remote']), ('repo', push['repo']))
+            lines.append(f'{full_name}{_format_labels(labels)} {push[field]:.15g}')
+    return '\n'.join(lines) + '\n'
+
+def metrics_snapshot():
+    """以字典形式返回所有指标，用于写入 JSON 快照"""
+    with _metrics_lock:
+        counters = [
+            {'name': name, 'labels': dict(labels), 'value': value}
+            for (name, labels), value in sorted(_metrics.items())
+        ]
+        histograms = [
+            {
+                'name': name,
+                'labels': dict(labels),
+                'count': histogram['count'],
+                'sum': histogram['sum'],
+                'buckets': {f'{bound:g}': count for bound, count in zip(histogram['bounds'], histogram['buckets'])}
+            }
+            for (name, labels), histogram in sorted(_histograms.items())
+        ]
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'), 'counters': counters, 'histograms': histograms,
+        'active_pushes': active_push_snapshots()
+    }
+
+def active_push_snapshots():
+    """正在进行的推送的进度"""
+    with _active_pushes_lock:
+        pushes = list(_active_pushes.values())
+    return [push.snapshot() for push in pushes]
+
+def write_metrics_snapshot(path):
+    """把指标快照写入 JSON 文件（先写临时文件再替换）"""
+    temp_file = path + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(metrics_snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, path)
+
+def create_metrics_server(bind, port):
+    """创建提供 /metrics 的 HTTP 服务"""
+    import http.server
+
+    class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+        """提供 /metrics 的 HTTP 处理器"""
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"指标请求: {self.address_string()} {format % args}")
+
+    return http.server.HTTPServer((bind, port), MetricsRequestHandler)
+
+def start_metrics(config):
+    """按 [Metrics] 配置启动指标 HTTP 服务和快照写入线程"""
+    if not config.getboolean('Metrics', 'enable', fallback=False):
+        return
+    
+    port = config.getint('Metrics', 'port', fallback=0)
+    if port:
+        bind = config['Metrics']['bind']
+        try:
+            server = create_metrics_server(bind, port)
+        except OSError as e:
+            logger.error(f"指标服务启动失败: {str(e)}")
+        else:
+            threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+            logger.info(f"指标服务已启动: http://{bind}:{port}/metrics")
+    
+    snapshot_file = config['Metrics']['snapshot_file'].strip()
+    if snapshot_file:
+        interval = config.getfloat('Metrics', 'snapshot_seconds', fallback=60)
+        def write_snapshots():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_metrics_snapshot(snapshot_file)
+                except OSError as e:
+                    logger.error(f"写入指标快照失败: {str(e)}")
+        threading.Thread(target=write_snapshots, name='metrics-snapshot', daemon=True).start()
+        logger.info(f"指标快照将每 {interval:g} 秒写入: {snapshot_file}")
+
+# 命令超时时的返回码（与 coreutils timeout 一致）
+TIMEOUT_RETURN_CODE = 124
+
+# 命令执行完成后的回调列表，参数为 (命令参数列表, 返回码, 耗时秒数)
+command_observers = []
+
+def _command_timeout(timeout):
+    """未指定超时时使用 [Git] command_timeout，0 表示不限制"""
+    if timeout is None:
+        timeout = load_config().getfloat('Git', 'command_timeout', fallback=120)
+    return timeout or None
+
+# 终止命令时先发送 SIGTERM，等待多少秒让 git 删除 index.lock 等锁文件，之后才强制终止
+KILL_GRACE_SECONDS = 5
+
+def _signal_process_tree(process, sig):
+    """向进程所在的进程组发送信号；Windows 上用 taskkill 强制终止整个进程树"""
+    try:
+        if os.name == 'nt':
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, sig)
+    except OSError:
+        try:
+            process.send_signal(sig)
+        except OSError:
+            pass
+
+def _kill_process_tree(process, grace=KILL_GRACE_SECONDS):
+    """终止进程及其子进程（如 git push 启动的 ssh / git-remote-https）
+
+    先发送 SIGTERM，git 收到后会删除自己持有的锁文件再退出；grace 秒后仍未退出才发送 SIGKILL，
+    否则被强制终止的 git add / commit 会留下 index.lock，之后的每条 git 命令都会失败。
+    """
+    if os.name == 'nt':
+        _signal_process_tree(process, None)
+        return
+    if grace:
+        _signal_process_tree(process, signal.SIGTERM)
+        try:
+            process.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            pass
+    _signal_process_tree(process, signal.SIGKILL)
+
+async def _kill_process_tree_async(process, grace=KILL_GRACE_SECONDS):
+    """_kill_process_tree 的 asyncio 版本"""
+    import asyncio
+    if os.name != 'nt' and grace:
+        _signal_process_tree(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), grace)
+            return
+        except asyncio.TimeoutError:
+            pass
+    _signal_process_tree(process, None if os.name == 'nt' else signal.SIGKILL)
+
+def _report_command(command, code, start):
+    """记录命令耗时并通知回调"""
+    elapsed = time.monotonic() - start
+    logger.debug(f"命令耗时 {elapsed:.3f}秒 (返回码 {code}): {' '.join(command)}")
+    for observer in command_observers:
+        observer(command, code, elapsed)
+
+def _spawn(command, cwd, stdin=None, env=None):
+    """以参数列表启动进程（不经过 shell），子进程单独成组以便超时后整体终止"""
+    return subprocess.Popen(
+        command,
+        stdin=stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+        start_new_session=(os.name != 'nt')
+    )
+
+def run_command(command, cwd=None, input=None, timeout=None, env=None):
+    """执行命令并返回 (标准输出, 标准错误, 返回码)
+
+    command 为参数列表；超时后终止整个进程树并返回 TIMEOUT_RETURN_CODE。
+    env 为完整的环境变量字典，未提供时继承当前进程的环境。
+    """
+    timeout = _command_timeout(timeout)
+    start = time.monotonic()
+    try:
+        process = _spawn(command, cwd, subprocess.PIPE if input is not None else None, env)
+    except OSError as e:
+        logger.error(f"执行命令时出错: {str(e)}")
+        return '', str(e), 1
+    
+    try:
+        output, error = process.communicate(
+            input.encode('utf-8', 'surrogateescape') if input is not None else None, timeout=timeout)
+        code = process.returncode
+    except subprocess.TimeoutExpired:
+        _kill_process_tree(process)
+        try:
+            output, error = process.communicate(timeout=5)
+        except subprocess.TimeoutExpired:
+            output, error = b'', b''
+        error += f"\n命令超时（{timeout:g}秒），已终止".encode('utf-8')
+        code = TIMEOUT_RETURN_CODE
+        logger.error(f"命令超时（{timeout:g}秒），已终止: {' '.join(command)}")
+    
+    _report_command(command, code, start)
+    return output.decode('utf-8', 'surrogateescape'), error.decode('utf-8', 'replace'), code
+
+def stream_command(command, cwd=None, on_stdout=None, on_stderr=None, timeout=None, chunk_size=64 * 1024,
+                   env=None, watchdog=None):
+    """执行命令并分块回调输出，不在内存中保留完整输出
+
+    on_stdout / on_stderr 接收 bytes 数据块；未提供 on_stderr 时保留标准错误的末尾部分。
+    watchdog 在命令运行期间每秒调用一次，返回非空字符串时终止命令，
+    该字符串追加到标准错误中，返回码为 TIMEOUT_RETURN_CODE。
+    返回 (标准错误, 返回码)。
+    """
+    timeout = _command_timeout(timeout)
+    start = time.monotonic()
+    try:
+        process = _spawn(command, cwd, subprocess.DEVNULL, env=env)
+    except OSError as e:
+        logger.error(f"执行命令时出错: {str(e)}")
+        return str(e), 1
+    
+    error_tail = bytearray()
+    def read_stderr():
+        for chunk in iter(lambda: process.stderr.read1(chunk_size), b''):
+            if on_stderr:
+                on_stderr(chunk)
+            else:
+                error_tail.extend(chunk)
+                del error_tail[:-chunk_size]
+    
+    timed_out = threading.Event()
+    def expire():
+        timed_out.set()
+        _kill_process_tree(process)
+    
+    aborted = []
+    finished = threading.Event()
+    def watch():
+        while not finished.wait(1):
+            message = watchdog()
+            if message:
+                aborted.append(message)
+                _kill_process_tree(process)
+                return
+    
+    timer = threading.Timer(timeout, expire) if timeout else None
+    stderr_thread = threading.Thread(target=read_stderr, daemon=True)
+    stderr_thread.start()
+    if timer:
+        timer.start()
+    if watchdog:
+        threading.Thread(target=watch, daemon=True).start()
+    try:
+        for chunk in iter(lambda: process.stdout.read1(chunk_size), b''):
+            if on_stdout:
+                on_stdout(chunk)
+        process.wait()
+        stderr_thread.join()
+    finally:
+        finished.set()
+        if timer:
+            timer.cancel()
+        if process.poll() is None:
+            _kill_process_tree(process)
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+    
+    error = error_tail.decode('utf-8', 'replace')
+    code = process.returncode
+    if timed_out.is_set():
+        error += f"\n命令超时（{timeout:g}秒），已终止"
+        code = TIMEOUT_RETURN_CODE
+        logger.error(f"命令超时（{timeout:g}秒），已终止: {' '.join(command)}")
+    elif aborted:
+        error += f"\n{aborted[0]}"
+        code = TIMEOUT_RETURN_CODE
+        logger.error(f"{aborted[0]}: {' '.join(command)}")
+    _report_command(command, code, start)
+    return error, code
+
+async def stream_command_async(command, cwd=None, on_stdout=None, timeout=None, chunk_size=64 * 1024):
+    """stream_command 的 asyncio 版本，返回 (标准错误, 返回码)"""
+    import asyncio
+    timeout = _command_timeout(timeout)
+    start = time.monotonic()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            start_new_session=(os.name != 'nt'))
+    except OSError as e:
         logger.error(f"执行命令时出错: {str(e)}")
-        return None, str(e), 1
+        return str(e), 1
+    
+    async def pump_stdout():
+        while True:
+            chunk = await process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            if on_stdout:
+                on_stdout(chunk)
+    
+    try:
+        _, error = await asyncio.wait_for(asyncio.gather(pump_stdout(), process.stderr.read()), timeout)
+        await process.wait()
+        error = error.decode('utf-8', 'replace')
+        code = process.returncode
+    except asyncio.TimeoutError:
+        await _kill_process_tree_async(process)
+        await process.wait()
+        error = f"命令超时（{timeout:g}秒），已终止"
+        code = TIMEOUT_RETURN_CODE
+        logger.error(f"命令超时（{timeout:g}秒），已终止: {' '.join(command)}")
+    _report_command(command, code, start)
+    return error, code
+
+def record_splitter(callback, separator=b'\0'):
+    """把分块输出拆成完整记录，逐条以字符串回调"""
+    remainder = [b'']
+    def feed(chunk):
+        records = (remainder[0] + chunk).split(separator)
+        remainder[0] = records.pop()
+        for record in records:
+            callback(record.decode('utf-8', 'surrogateescape'))
+    return feed
 
 def check_git_repo(repo_path):
     """检查Git仓库状态"""
@@ -449,24 +1151,29 @@ def check_git_repo(repo_path):
     logger.info("Git仓库已存在")
     
     # 获取远程仓库信息
-    remote_output, remote_error, remote_code = run_command('git remote -v', repo_path)
+    remote_output, remote_error, remote_code = run_command(['git', 'remote', '-v'], repo_path)
     if remote_code == 0 and remote_output:
         logger.info(f"远程仓库信息:\n{remote_output.strip()}")
     else:
         logger.warning("未配置远程仓库")
     
     # 获取当前分支信息
-    branch_output, branch_error, branch_code = run_command('git branch --show-current', repo_path)
+    branch_output, branch_error, branch_code = run_command(['git', 'branch', '--show-current'], repo_path)
     if branch_code == 0:
         logger.info(f"当前分支: {branch_output.strip()}")
     
     # 获取最后一次提交信息
-    last_commit_output, last_commit_error, last_commit_code = run_command('git log -1 --oneline', repo_path)
+    last_commit_output, last_commit_error, last_commit_code = run_command(['git', 'log', '-1', '--oneline'], repo_path)
     if last_commit_code == 0:
         logger.info(f"最后一次提交: {last_commit_output.strip()}")
     
     return True
 
+def check_remote_exists(repo_path, remote='origin'):
+    """检查是否已配置远程仓库"""
+    _, _, code = run_command(['git', 'remote', 'get-url', remote], repo_path)
+    return code == 0
+
 def add_remote(repo_path, remote_url=None):
     """添加远程仓库"""
     config = load_config()
@@ -476,12 +1183,11 @@ def add_remote(repo_path, remote_url=None):
     if not remote_url:
         remote_url = input("请输入GitHub仓库URL: ").strip()
         config['Git']['remote_url'] = remote_url
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            config.write(f)
+        save_config(config)
     
     if not check_remote_exists(repo_path):
         logger.info("正在添加远程仓库...")
-        output, error, code = run_command(f'git remote add origin {remote_url}', repo_path)
+        output, error, code = run_command(['git', 'remote', 'add', 'origin', remote_url], repo_path)
         if code == 0:
             logger.info("远程仓库添加成功")
         else:
@@ -489,130 +1195,1662 @@ def add_remote(repo_path, remote_url=None):
             return False
     return True
 
-def check_git_changes(repo_path):
-    """详细检查Git变更"""
-    # 检查未暂存的变更
-    diff_output, _, _ = run_command('git diff --numstat', repo_path)
-    if diff_output.strip():
-        logger.info("未暂存的文件变更:")
-        for line in diff_output.strip().split('\n'):
-            if line.strip():
-                additions, deletions, file = line.split('\t')
-                logger.info(f"  {file}: +{additions} -{deletions}")
-
-    # 检查已暂存的变更
-    staged_output, _, _ = run_command('git diff --cached --numstat', repo_path)
-    if staged_output.strip():
-        logger.info("已暂存的文件变更:")
-        for line in staged_output.strip().split('\n'):
-            if line.strip():
-                additions, deletions, file = line.split('\t')
-                logger.info(f"  {file}: +{additions} -{deletions}")
-
-    # 检查未跟踪的文件
-    untracked_output, _, _ = run_command('git ls-files --others --exclude-standard', repo_path)
-    if untracked_output.strip():
-        logger.info("未跟踪的文件:")
-        for file in untracked_output.strip().split('\n'):
-            if file.strip():
-                logger.info(f"  {file}")
-
-def push_to_github(repo_path, force_push=False):
-    """推送更改到GitHub"""
+# porcelain 状态码的含义（v2 中未变更用 '.' 表示，统一转换为空格后查表）
+STATUS_DESC = {
+    'M ': '已修改',
+    ' M': '已修改但未暂存',
+    'A ': '新增到暂存区',
+    ' A': '新文件未暂存',
+    'D ': '已删除',
+    ' D': '已删除但未暂存',
+    'R ': '已重命名',
+    'C ': '已复制',
+    'U ': '更新但未合并',
+    '??': '未跟踪'
+}
+
+# 单个文件的变更：kind 为 porcelain v2 的记录类型（1 普通、2 重命名/复制、u 未合并、? 未跟踪）
+FileChange = namedtuple('FileChange', ['kind', 'xy', 'path', 'orig_path'])
+
+class ChangeSet:
+    """一次状态扫描得到的结构化变更集合"""
+
+    def __init__(self):
+        self.entries = []
+        self.branch_oid = None
+        self.branch_head = None
+        self.upstream = None
+        self.ahead = None
+        self.behind = None
+        # 路径 -> (新增行数, 删除行数)，仅在需要时才统计，二进制文件为 None
+        self.numstat = {}
+        # 扫描开始时间，以及暂存时被 [Guard] 拦截的路径
+        self.scanned_at = time.time()
+        self.held_back = []
+        # 重命名记录之后的下一条记录是原路径
+        self._expect_orig_path = False
+
+    def add_record(self, record):
+        """解析 git status --porcelain=v2 --branch -z 的一条记录"""
+        if self._expect_orig_path:
+            self._expect_orig_path = False
+            self.entries[-1] = self.entries[-1]._replace(orig_path=record)
+            return
+        if not record:
+            return
+        kind = record[0]
+        if kind == '#':
+            header, _, value = record[2:].partition(' ')
+            if header == 'branch.oid':
+                self.branch_oid = value
+            elif header == 'branch.head':
+                self.branch_head = value
+            elif header == 'branch.upstream':
+                self.upstream = value
+            elif header == 'branch.ab':
+                ahead, behind = value.split()
+                self.ahead, self.behind = int(ahead), -int(behind)
+        elif kind == '1':
+            fields = record.split(' ', 8)
+            self.entries.append(FileChange('1', fields[1], fields[8], None))
+        elif kind == '2':
+            fields = record.split(' ', 9)
+            self.entries.append(FileChange('2', fields[1], fields[9], None))
+            self._expect_orig_path = True
+        elif kind == 'u':
+            fields = record.split(' ', 10)
+            self.entries.append(FileChange('u', fields[1], fields[10], None))
+        elif kind == '?':
+            self.entries.append(FileChange('?', '??', record[2:], None))
+
+    @property
+    def empty(self):
+        return not self.entries
+
+    @property
+    def is_initial(self):
+        return self.branch_oid == '(initial)'
+
+    def counts(self, entries=None):
+        """按变更类型统计文件数，entries 默认为全部记录"""
+        counts = {'modified': 0, 'added': 0, 'deleted': 0, 'renamed': 0,
+                  'copied': 0, 'unmerged': 0, 'untracked': 0}
+        for entry in self.entries if entries is None else entries:
+            counts[change_category(entry)] += 1
+        return counts
+
+    def line_totals(self):
+        """返回 (新增行数, 删除行数)，未统计 numstat 时返回 None"""
+        if not self.numstat:
+            return None
+        added = sum(stat[0] for stat in self.numstat.values() if stat[0] is not None)
+        removed = sum(stat[1] for stat in self.numstat.values() if stat[1] is not None)
+        return added, removed
+
+def change_category(entry):
+    """一条变更记录的类型（与 ChangeSet.counts 的键一致）"""
+    if entry.kind == '?':
+        return 'untracked'
+    if entry.kind == 'u':
+        return 'unmerged'
+    if 'R' in entry.xy:
+        return 'renamed'
+    if 'C' in entry.xy:
+        return 'copied'
+    if 'D' in entry.xy:
+        return 'deleted'
+    if 'A' in entry.xy:
+        return 'added'
+    return 'modified'
+
+def parse_numstat(output):
+    """解析 git diff --numstat -z 的输出，返回 路径 -> (新增, 删除)"""
+    numstat = {}
+    records = output.split('\0')
+    index = 0
+    while index < len(records):
+        record = records[index]
+        index += 1
+        if not record:
+            continue
+        parts = record.split('\t', 2)
+        if len(parts) != 3:
+            continue
+        added, deleted, path = parts
+        if not path:
+            # 重命名: 路径为空，随后依次是原路径和新路径
+            path = records[index + 1] if index + 1 < len(records) else ''
+            index += 2
+        numstat[path] = (
+            int(added) if added.isdigit() else None,
+            int(deleted) if deleted.isdigit() else None
+        )
+    return numstat
+
+def check_git_changes(repo_path, with_numstat=None):
+    """一次扫描检查Git变更，返回结构化的变更集合
+
+    只运行一次 git status --porcelain=v2；numstat 仅在启用详细日志或指标时统计。
+    """
+    if with_numstat is None:
+        with_numstat = numstat_enabled(load_config())
+    
+    changes = ChangeSet()
+    status_error, status_code = stream_command(
+        ['git', 'status', '--porcelain=v2', '--branch', '-z', '--untracked-files=all'],
+        repo_path, on_stdout=record_splitter(changes.add_record))
+    if status_code != 0:
+        logger.error(f"获取仓库状态失败: {status_error}")
+        return None
+    
+    if with_numstat:
+        add_numstat(repo_path, changes)
+    return changes
+
+def numstat_enabled(config):
+    """是否需要统计增删行数（详细日志或指标启用时）"""
+    return (config.getboolean('Log', 'verbose', fallback=False)
+            or config.getboolean('Metrics', 'enable', fallback=False))
+
+def add_numstat(repo_path, changes):
+    """为变更集合补充 git diff HEAD --numstat 的增删行数"""
+    if changes.empty or changes.is_initial or changes.numstat:
+        return
+    numstat_output, _, numstat_code = run_command(['git', 'diff', 'HEAD', '--numstat', '-z'], repo_path)
+    if numstat_code == 0:
+        changes.numstat = parse_numstat(numstat_output)
+
+def add_staged_numstat(repo_path, changes):
+    """暂存后用 git diff --cached --numstat 统计本次提交的增删行数，覆盖暂存前的统计
+
+    暂存前的 git diff HEAD 不包含未跟踪的文件，提交信息和指标中的行数都以这里为准。
+    """
+    numstat_output, _, numstat_code = run_command(['git', 'diff', '--cached', '--numstat', '-z'], repo_path)
+    if numstat_code == 0:
+        changes.numstat = parse_numstat(numstat_output)
+
+async def check_git_changes_async(repo_path):
+    """check_git_changes 的 asyncio 版本，只做状态扫描，不统计 numstat"""
+    changes = ChangeSet()
+    status_error, status_code = await stream_command_async(
+        ['git', 'status', '--porcelain=v2', '--branch', '-z', '--untracked-files=all'],
+        repo_path, on_stdout=record_splitter(changes.add_record))
+    if status_code != 0:
+        logger.error(f"[{repo_label(repo_path)}] 获取仓库状态失败: {status_error}")
+        return None
+    return changes
+
+# 每次 git add 通过 stdin 传入的最多路径数
+ADD_BATCH_SIZE = 1000
+# 不支持 --pathspec-from-file 时路径作为命令行参数传入，每批更少以免超过命令行长度限制
+ARG_BATCH_SIZE = 100
+
+# 当前 git 是否支持 git add --pathspec-from-file（2.25 起），不支持时回退到完整 add
+_pathspec_from_file = {'supported': True}
+
+def paths_to_stage(changes):
+    """返回工作区中有未暂存变更的路径（只有暂存区变更的文件无需再次 add）"""
+    paths = []
+    for entry in changes.entries:
+        if entry.kind in ('?', 'u') or entry.xy[1] != '.':
+            # 重命名记录的原路径已在暂存区中处理，只需暂存新路径
+            paths.append(entry.path)
+    return paths
+
+# 判断二进制文件时读取的字节数（与 git 的判断方式一致）
+BINARY_SNIFF_BYTES = 8000
+
+# git lfs 是否可用，首次使用时检测
+_lfs_available = {}
+
+def is_binary_file(path):
+    """文件开头包含 NUL 字节时视为二进制文件"""
+    try:
+        with open(path, 'rb') as f:
+            return b'\0' in f.read(BINARY_SNIFF_BYTES)
+    except OSError:
+        return False
+
+def lfs_available(repo_path):
+    """检测 git lfs 是否已安装"""
+    if 'result' not in _lfs_available:
+        _, _, code = run_command(['git', 'lfs', 'version'], repo_path)
+        _lfs_available['result'] = code == 0
+    return _lfs_available['result']
+
+def apply_stage_guard(repo_path, paths, config):
+    """暂存前按文件大小和类型过滤路径
+
+    返回 (允许暂存的路径, 转交 LFS 的路径, 被拦截的 [(路径, 大小, 原因)])。
+    """
+    guard = config['Guard']
+    if not config.getboolean('Guard', 'enable', fallback=True):
+        return paths, [], []
+    
+    max_file = config.getfloat('Guard', 'max_file_mb', fallback=100) * 1024 * 1024
+    max_push = config.getfloat('Guard', 'max_push_mb', fallback=0) * 1024 * 1024
+    block_binary = config.getboolean('Guard', 'block_binary', fallback=False)
+    skip_patterns = split_list(guard['skip_list'])
+    use_lfs = guard['policy'] == 'lfs' and lfs_available(repo_path)
+    
+    allowed, lfs_paths, held_back = [], [], []
+    total = 0
+    for path in paths:
+        full_path = os.path.join(repo_path, path)
+        try:
+            size = os.lstat(full_path).st_size
+        except OSError:
+            # 已删除的文件
+            allowed.append(path)
+            continue
+        
+        if any(fnmatch.fnmatch(path, pattern) for pattern in skip_patterns):
+            held_back.append((path, size, '匹配 skip_list'))
+            continue
+        
+        reason = None
+        if max_file and size > max_file:
+            reason = f"超过单文件上限 {max_file / 1024 / 1024:g}MB"
+        elif block_binary and is_binary_file(full_path):
+            reason = "二进制文件"
+        if reason and use_lfs:
+            lfs_paths.append(path)
+            continue
+        if reason:
+            held_back.append((path, size, reason))
+            continue
+        
+        if max_push and allowed and total + size > max_push:
+            held_back.append((path, size, f"超过单次推送上限 {max_push / 1024 / 1024:g}MB，留待下次推送"))
+            continue
+        total += size
+        allowed.append(path)
+    return allowed, lfs_paths, held_back
+
+def report_held_back(repo_path, held_back, config):
+    """输出被拦截文件的汇总并记录指标"""
+    if not held_back:
+        return
+    limit = config.getint('Log', 'max_file_lines', fallback=50)
+    total = sum(size for _, size, _ in held_back)
+    logger.warning(f"有 {len(held_back)} 个文件未暂存，共 {total / 1024 / 1024:.1f}MB:")
+    for path, size, reason in (held_back[:limit] if limit > 0 else held_back):
+        logger.warning(f"  {path} ({size / 1024 / 1024:.1f}MB): {reason}")
+    if 0 < limit < len(held_back):
+        logger.warning(f"  ... 另有 {len(held_back) - limit} 个文件未列出")
+    inc_metric('held_back_files_total', len(held_back), repo=repo_label(repo_path))
+    inc_metric('held_back_bytes_total', total, repo=repo_label(repo_path))
+
+def _run_in_batches(command, repo_path, paths):
+    """分批通过 stdin 把路径传给支持 --pathspec-from-file 的命令，遇到第一个失败的批次即停止"""
+    for start in range(0, len(paths), ADD_BATCH_SIZE):
+        batch = paths[start:start + ADD_BATCH_SIZE]
+        _, error, code = run_command(
+            ['git', '--literal-pathspecs'] + command + ['--pathspec-from-file=-', '--pathspec-file-nul'],
+            repo_path, input='\0'.join(batch) + '\0')
+        if code != 0:
+            return error, code
+    return '', 0
+
+def _run_with_path_args(command, repo_path, paths):
+    """分批把路径作为命令行参数传给命令，用于不支持 --pathspec-from-file 的 git，遇到第一个失败的批次即停止"""
+    for start in range(0, len(paths), ARG_BATCH_SIZE):
+        _, error, code = run_command(
+            ['git', '--literal-pathspecs'] + command + ['--'] + paths[start:start + ARG_BATCH_SIZE], repo_path)
+        if code != 0:
+            return error, code
+    return '', 0
+
+def stage_changes(repo_path, changes, config):
+    """按变更集合暂存文件，返回 (标准错误, 返回码, 暂存的路径数)
+
+    路径分批通过 git add --pathspec-from-file 传入，删除的文件也会被暂存；
+    路径数超过 [Git] full_add_threshold 时改用 git add .。
+    暂存前由 [Guard] 拦截过大的文件和二进制文件；有文件被拦截时总是传入明确的路径，
+    不使用 git add .，否则被拦截文件的内容已经写入 .git/objects。
+    """
+    paths = paths_to_stage(changes)
+    if not paths:
+        logger.info("所有更改均已暂存")
+        return '', 0, 0
+    
+    paths, lfs_paths, held_back = apply_stage_guard(repo_path, paths, config)
+    report_held_back(repo_path, held_back, config)
+    changes.held_back = held_back
+    if lfs_paths:
+        logger.info(f"{len(lfs_paths)} 个文件将通过 Git LFS 存储")
+        for path in lfs_paths:
+            _, error, code = run_command(['git', 'lfs', 'track', '--filename', path], repo_path)
+            if code != 0:
+                return error, code, 0
+        paths = paths + lfs_paths + ['.gitattributes']
+    if not paths:
+        return '', 0, 0
+    
+    threshold = config.getint('Git', 'full_add_threshold', fallback=5000)
+    if (not threshold or len(paths) <= threshold) and _pathspec_from_file['supported']:
+        error, code = _run_in_batches(['add', '-A'], repo_path, paths)
+        if code == 0:
+            logger.info(f"已暂存 {len(paths)} 个文件的更改")
+            return error, code, len(paths)
+        if 'pathspec-from-file' not in error:
+            return error, code, 0
+        logger.warning("当前 git 版本不支持 --pathspec-from-file，改用 git add .")
+        _pathspec_from_file['supported'] = False
+    
+    if held_back:
+        if _pathspec_from_file['supported']:
+            error, code = _run_in_batches(['add', '-A'], repo_path, paths)
+        else:
+            error, code = _run_with_path_args(['add', '-A'], repo_path, paths)
+        if code == 0:
+            logger.info(f"已暂存 {len(paths)} 个文件的更改")
+        return error, code, len(paths) if code == 0 else 0
+    
+    logger.info(f"已暂存 {len(paths)} 个文件的更改（完整添加）")
+    _, error, code = run_command(['git', 'add', '.'], repo_path)
+    return error, code, len(paths)
+
+def log_changes(changes):
+    """输出变更集合的详细日志"""
+    if changes.empty:
+        logger.info("没有发现新的更改")
+        return
+    
+    limit = load_config().getint('Log', 'max_file_lines', fallback=50)
+    logger.info("Git状态:")
+    for entry in (changes.entries[:limit] if limit > 0 else changes.entries):
+        xy = entry.xy.replace('.', ' ')
+        status_desc = STATUS_DESC.get(xy) or STATUS_DESC.get(xy[0] + ' ') or STATUS_DESC.get(' ' + xy[1], '未知状态')
+        if entry.kind == 'u':
+            status_desc = STATUS_DESC['U ']
+        elif entry.orig_path:
+            status_desc = f"{status_desc} ({entry.orig_path} ->)"
+        stat = changes.numstat.get(entry.path)
+        if stat:
+            added, deleted = ('-' if value is None else value for value in stat)
+            logger.info(f"  {status_desc}: {entry.path} +{added} -{deleted}")
+        else:
+            logger.info(f"  {status_desc}: {entry.path}")
+    if 0 < limit < len(changes.entries):
+        logger.info(f"  ... 另有 {len(changes.entries) - limit} 个文件未列出")
+    
+    summary = ', '.join(f"{name} {count}" for name, count in changes.counts().items() if count)
+    totals = changes.line_totals()
+    if totals:
+        summary += f", +{totals[0]} -{totals[1]}"
+    logger.info(f"变更汇总: {summary}")
+
+# 提交信息中文件列表使用的状态字母（未跟踪的文件提交后即为新增）
+CATEGORY_LETTERS = {
+    'modified': 'M', 'added': 'A', 'deleted': 'D', 'renamed': 'R',
+    'copied': 'C', 'unmerged': 'U', 'untracked': 'A'
+}
+
+def build_commit_message(repo_path, changes, config, timestamp):
+    """按 [Commit] 模板生成提交信息，只使用已扫描的变更集合，不调用 git
+
+    模板中可用的占位符见 commit_message_fields；某一行引用的占位符都为空时整行省略。
+    返回 (标题, 完整提交信息)。
+    """
+    held = {path for path, _, _ in changes.held_back}
+    entries = [entry for entry in changes.entries if entry.path not in held]
+    fields = commit_message_fields(repo_path, changes, entries, config, timestamp)
+    templates = [repo_option(config, repo_path, 'Commit', key) for key in ('subject', 'body')]
+    try:
+        subject, body = (render_template(template, fields) for template in templates)
+    except (KeyError, ValueError, IndexError) as e:
+        logger.warning(f"提交信息模板无效（{e}），使用默认提交信息")
+        subject, body = f"Auto commit at {timestamp}", ''
+    subject = subject.replace('\n', ' ').strip() or f"Auto commit at {timestamp}"
+    
+    max_length = config.getint('Commit', 'max_length', fallback=4096)
+    if max_length > 0 and len(subject) + 2 + len(body) > max_length:
+        marker = '\n...'
+        lines = body[:max(0, max_length - len(subject) - 2 - len(marker))].split('\n')
+        # 截断到完整的行
+        body = '\n'.join(lines[:-1]) + marker if len(lines) > 1 else marker.lstrip('\n')
+    return subject, f"{subject}\n\n{body}\n" if body else f"{subject}\n"
+
+def commit_message_fields(repo_path, changes, entries, config, timestamp):
+    """提交信息模板的占位符"""
+    counts = changes.counts(entries)
+    # 未跟踪的文件提交后即为新增
+    counts['added'] += counts.pop('untracked')
+    top_dirs = {}
+    for entry in entries:
+        directory = entry.path.split('/', 1)[0] if '/' in entry.path else '.'
+        top_dirs[directory] = top_dirs.get(directory, 0) + 1
+    max_dirs = config.getint('Commit', 'max_dirs', fallback=5)
+    ranked = sorted(top_dirs.items(), key=lambda item: (-item[1], item[0]))
+    dirs = ', '.join(f"{name} ({count})" for name, count in ranked[:max_dirs])
+    if len(ranked) > max_dirs:
+        dirs += f", +{len(ranked) - max_dirs} more"
+    
+    max_files = config.getint('Commit', 'max_files', fallback=20)
+    file_list = [
+        f"{CATEGORY_LETTERS[change_category(entry)]} "
+        + (f"{entry.orig_path} -> {entry.path}" if entry.orig_path else entry.path)
+        for entry in entries[:max_files]
+    ]
+    if len(entries) > max_files:
+        file_list.append(f"... and {len(entries) - max_files} more")
+    
+    # 增删行数只在本轮已统计 numstat 时可用（见 numstat_enabled），来自暂存后的 add_staged_numstat
+    totals = changes.line_totals()
+    return {
+        'timestamp': timestamp,
+        'repo': repo_label(repo_path),
+        'branch': changes.branch_head or '',
+        'files': len(entries),
+        'summary': ', '.join(f"{name} {count}" for name, count in counts.items() if count),
+        'lines': f"+{totals[0]} -{totals[1]}" if totals else '',
+        'top_dirs': dirs,
+        'file_list': '\n'.join(file_list),
+    }
+
+def render_template(template, fields):
+    """逐行填充模板，某一行引用的占位符都为空时省略该行"""
+    lines = []
+    for line in template.split('\n'):
+        names = [name for _, name, _, _ in string.Formatter().parse(line) if name]
+        if names and not any(str(fields[name]) for name in names):
+            continue
+        lines.append(line.format_map(fields))
+    return '\n'.join(lines).strip()
+
+def push_to_github(repo_path, force_push=False, changes=None, tree_fingerprint=None, interactive=False):
+    """推送更改到GitHub
+
+    changes 为调用方已扫描得到的变更集合时，不再重复执行 git status。
+    tree_fingerprint 为扫描前计算的工作区指纹，会记录到状态库供下一轮预检查使用。
+    interactive 为 True（手动推送）时失败不记录退避或暂停。
+    """
     config = load_config()
-    branch = config['Git']['branch']
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     # 检查是否有更改
     logger.info("检查仓库状态...")
     
-    # 获取详细的变更信息
-    check_git_changes(repo_path)
-    
-    # 使用porcelain格式获取状态
-    status_output, status_error, status_code = run_command('git status --porcelain', repo_path)
-    if status_output.strip():
-        logger.info("Git状态:")
-        for line in status_output.strip().split('\n'):
-            status = line[:2]
-            file = line[3:]
-            status_desc = {
-                'M ': '已修改',
-                ' M': '已修改但未暂存',
-                'A ': '新增到暂存区',
-                ' A': '新文件未暂存',
-                'D ': '已删除',
-                ' D': '已删除但未暂存',
-                'R ': '已重命名',
-                'C ': '已复制',
-                'U ': '更新但未合并',
-                '??': '未跟踪'
-            }.get(status, '未知状态')
-            logger.info(f"  {status_desc}: {file}")
+    # 一次扫描获取结构化的变更信息
+    if changes is not None:
+        if numstat_enabled(config):
+            add_numstat(repo_path, changes)
     else:
-        logger.info("没有发现新的更改")
+        with stage_timer(repo_path, 'status'):
+            changes = check_git_changes(repo_path)
+    if changes is None:
+        record_stage_failure(repo_path, 'status')
+        return False
+    log_changes(changes)
     
-    if not status_output.strip() and not force_push:
-        logger.info("没有需要提交的更改")
-        return True
+    result = commit_and_push(repo_path, config, changes, force_push, interactive)
+    if result:
+        record_cycle_state(repo_path, changes, tree_fingerprint)
+    return result
 
-    if not force_push:
-        # 添加所有更改
+def commit_and_push(repo_path, config, changes, force_push=False, interactive=False):
+    """根据变更集合完成暂存、提交和推送"""
+    branch = push_branch(config, repo_path, changes)
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    batch = get_batch_policy(config)
+    batch_key = os.path.abspath(repo_path)
+    if changes.empty and not force_push:
+        # 没有新更改时，只有到期的批量提交或之前没有推送成功的提交才需要推送
+        due, reason = batch_due(batch_key, batch, changes) if batch else (False, None)
+        if not due and batch_deadline(repo_path, batch) is None:
+            # 没有等待中的批量提交时，补推之前推送失败的远程仓库
+            due, reason = unpushed_head(repo_path, config, changes)
+        if not due:
+            logger.info("没有需要提交的更改")
+            return True
+        logger.info(f"需要推送: {reason}")
+    elif not force_push:
+        # 只暂存变更集合中的路径
         logger.info("正在添加更改...")
-        add_output, add_error, add_code = run_command('git add .', repo_path)
+        with stage_timer(repo_path, 'add'):
+            add_error, add_code, staged = stage_changes(repo_path, changes, config)
         if add_code != 0:
             logger.error(f"添加更改失败: {add_error}")
+            record_stage_failure(repo_path, 'add')
             return False
+        if not staged and not any(entry.kind != '?' and entry.xy[0] != '.' for entry in changes.entries):
+            logger.info("没有可提交的更改")
+            return True
+        if numstat_enabled(config):
+            add_staged_numstat(repo_path, changes)
+
+        # 提交更改；squash 模式下把更改合并到尚未推送的批量提交中，提交信息汇总合并的各轮更改
+        with _batch_lock:
+            state = dict(_batch_state.get(batch_key) or {})
+        amend = bool(batch and batch['squash'] and state and state['head'] == changes.branch_oid)
+        squashed = None
+        if batch and batch['squash']:
+            squashed = squash_change_set(changes, state.get('entries') if amend else None)
+        commit_message, commit_text = build_commit_message(
+            repo_path, squashed if squashed is not None else changes, config, timestamp)
+        commit_cmd = ['git', 'commit', '-F', '-']
+        if amend:
+            commit_cmd.append('--amend')
+            logger.info(f"正在合并到未推送的提交: {commit_message}")
         else:
-            # 显示已暂存的更改
-            staged_output, _, _ = run_command('git diff --cached --stat', repo_path)
-            if staged_output.strip():
-                logger.info(f"已暂存以下更改:\n{staged_output.strip()}")
-
-        # 提交更改
-        commit_message = f"Auto commit at {timestamp}"
-        logger.info(f"正在提交更改: {commit_message}")
-        commit_output, commit_error, commit_code = run_command(f'git commit -m "{commit_message}"', repo_path)
+            logger.info(f"正在提交更改: {commit_message}")
+        with stage_timer(repo_path, 'commit'):
+            commit_output, commit_error, commit_code = run_command(commit_cmd, repo_path, input=commit_text)
         if commit_code != 0:
             logger.error(f"提交更改失败: {commit_error}")
+            record_stage_failure(repo_path, 'commit')
             return False
         else:
-            logger.info(f"提交成功: {commit_output.strip()}")
+            logger.info(f"提交成功: {truncate_lines(commit_output, 2)}")
+        record_change_metrics(repo_path, changes)
+        
+        if batch:
+            record_batch_commit(batch_key, repo_path, changes, squashed)
+            due, reason = batch_due(batch_key, batch, changes)
+            if not due:
+                return True
+            logger.info(f"达到批量推送条件: {reason}")
+
+    # 推送到所有远程仓库，失败、退避和暂停按远程仓库分别记录；跳过退避或暂停中的远程仓库（手动推送除外）
+    remotes = push_remotes(config, repo_path)
+    primary = remotes[0]
+    if not interactive:
+        for remote, reason in blocked_remotes(config, repo_path).items():
+            logger.info(f"跳过 {remote}: {reason}")
+            remotes.remove(remote)
+        if not remotes:
+            return False
+    # 变基/合并只作用于当前检出的分支，并且只从主远程仓库同步
+    sync = (not force_push and config['Sync']['mode'] in ('rebase', 'merge')
+            and changes.branch_head in (branch, None) and remotes[0] == primary)
+    if len(remotes) == 1:
+        results = [push_remote(repo_path, remotes[0], branch, config, force_push, sync, mirror=remotes[0] != primary)]
+    else:
+        logger.info(f"并发推送到 {len(remotes)} 个远程仓库: {', '.join(remotes)}")
+        results = push_remotes_concurrently(repo_path, remotes, primary, branch, config, force_push, sync)
+        if results[0]['synced']:
+            # 主远程仓库同步后本地分支被改写，镜像需要更新为同步后的提交
+            logger.info("本地分支已与主远程仓库同步，重新推送镜像")
+            results[1:] = push_remotes_concurrently(repo_path, remotes[1:], primary, branch, config, force_push, False)
+    
+    for remote, result in zip(remotes, results):
+        if result['ok']:
+            clear_push_failure(repo_path, remote)
+        elif not interactive:
+            record_push_failure(repo_path, remote, result['error_kind'], config)
+    # 主远程仓库推送成功即清除批量状态并记录已推送的提交，推送失败的镜像由 unpushed_head 在之后补推
+    if remotes[0] == primary and results[0]['ok']:
+        clear_batch_state(batch_key)
+        update_repo_state(repo_path, last_pushed_sha=results[0]['local_sha'])
+    return all(result['ok'] for result in results)
 
+def unpushed_head(repo_path, config, changes):
+    """工作区没有更改时，判断 HEAD 是否还没有推送到所有远程仓库
+
+    只读取状态库和 ref 文件，不启动 git；退避或暂停中的远程仓库不计入。返回 (是否需要推送, 原因)。
+    """
+    head = changes.branch_oid
+    if not head or head == '(initial)':
+        return False, None
+    blocked = blocked_remotes(config, repo_path)
+    remotes = [remote for remote in push_remotes(config, repo_path) if remote not in blocked]
+    if not remotes:
+        return False, None
+    if head != get_repo_state(repo_path)['last_pushed_sha'] and remotes[0] == push_remotes(config, repo_path)[0]:
+        return True, f"提交 {head[:7]} 尚未推送成功"
+    branch = push_branch(config, repo_path, changes)
+    for remote in remotes:
+        if read_ref(repo_path, f'refs/remotes/{remote}/{branch}') != head:
+            return True, f"提交 {head[:7]} 尚未推送到 {remote}"
+    return False, None
+
+def push_branch(config, repo_path, changes=None):
+    """仓库要推送的分支
+
+    [repo:...] 中设置了 branch 时使用该分支；否则使用 [Git] branch，
+    该分支在仓库中不存在时（如仓库的主分支是 main）使用当前检出的分支。
+    """
+    override = repo_section(config, repo_path)
+    if override is not None and 'branch' in override:
+        return override['branch']
+    branch = config['Git']['branch']
+    if read_ref(repo_path, f'refs/heads/{branch}') is not None:
+        return branch
+    current = changes.branch_head if changes is not None else current_branch(repo_path)
+    return current if current and current != '(detached)' else branch
+
+def push_remotes(config, repo_path):
+    """仓库要推送的远程仓库列表，第一个为主远程仓库（同步时从它拉取），其余为镜像"""
+    return split_list(repo_option(config, repo_path, 'Git', 'remotes')) or ['origin']
+
+def push_remotes_concurrently(repo_path, remotes, primary, branch, config, force_push, sync):
+    """每个远程仓库一个线程并发推送，超时和结果相互独立；只有主远程仓库会同步"""
+    import concurrent.futures
+    label = repo_label(repo_path)
+    
+    def push_one(remote):
+        _repo_context.name = f'{label}@{remote}'
+        try:
+            is_primary = remote == primary
+            return push_remote(repo_path, remote, branch, config, force_push, sync and is_primary, mirror=not is_primary)
+        finally:
+            _repo_context.name = ''
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(remotes), thread_name_prefix='git-push-remote') as executor:
+        futures = [executor.submit(push_one, remote) for remote in remotes]
+        return [future.result() for future in futures]
+
+def push_remote(repo_path, remote, branch, config, force_push=False, sync=False, mirror=False):
+    """把分支推送到一个远程仓库
+
+    配置了 push_branches 时，名称匹配且领先远程的所有本地分支在同一条 git push 中推送，
+    否则只推送 branch。sync 为 True 时，branch 的远程分支有新的提交会先同步再推送。
+    mirror 为 True 时使用 --force-with-lease 推送：镜像只由本程序写入，远程跟踪分支就是
+    上次推送的提交，因此主远程仓库同步改写历史后镜像也能跟上，而镜像被其他人修改时推送会被拒绝。
+    返回 {'ok', 'error_kind', 'local_sha', 'synced'}，local_sha 为 branch 的本地提交。
+    """
+    result = {'ok': False, 'error_kind': 'unknown', 'local_sha': None, 'synced': False}
+    labels = {'repo': repo_label(repo_path), 'remote': remote}
+    patterns = split_list(repo_option(config, repo_path, 'Git', 'push_branches'))
+    
+    # 比较本地分支与远程跟踪分支，没有需要发送的提交时跳过推送
+    if patterns:
+        targets = select_push_branches(repo_path, remote, patterns)
+        result['local_sha'] = read_ref(repo_path, f'refs/heads/{branch}')
+    else:
+        local_sha, remote_sha = get_branch_refs(repo_path, remote, branch)
+        result['local_sha'] = local_sha
+        if local_sha is None:
+            logger.error(f"本地分支不存在: {branch}")
+            return result
+        targets = [(branch, local_sha, remote_sha)]
+    if targets and config.getboolean('Push', 'verify_remote', fallback=False):
+        # 读取失败时沿用远程跟踪分支；读取成功但远程没有该分支时视为不存在，需要推送
+        heads = get_remote_heads(repo_path, remote, [name for name, _, _ in targets])
+        if heads is not None:
+            targets = [(name, local_sha, heads.get(name)) for name, local_sha, _ in targets]
+    targets = [target for target in targets if target[1] != target[2]]
+    if not targets:
+        if patterns:
+            logger.info("没有需要推送的分支，跳过推送")
+        else:
+            logger.info(f"远程分支已是最新 ({result['local_sha'][:7]})，跳过推送")
+        inc_metric('push_skipped_total', **labels)
+        result.update(ok=True, error_kind=None)
+        return result
+    
     # 获取远程仓库URL
-    remote_url_output, _, remote_url_code = run_command('git remote get-url origin', repo_path)
+    remote_url_output, _, remote_url_code = run_command(['git', 'remote', 'get-url', remote], repo_path)
     if remote_url_code == 0:
         logger.info(f"推送到远程仓库: {remote_url_output.strip()}")
     
-    # 获取本地和远程的差异
-    ahead_behind, _, _ = run_command(f'git rev-list --left-right --count origin/{branch}...HEAD', repo_path)
-    if ahead_behind and len(ahead_behind.split()) == 2:
-        behind, ahead = ahead_behind.split()
-        if int(ahead) > 0:
-            logger.info(f"本地领先远程 {ahead} 个提交")
-        if int(behind) > 0:
-            logger.info(f"本地落后远程 {behind} 个提交")
-    
-    # 推送到远程仓库
-    logger.info(f"正在推送到远程仓库 (分支: {branch})")
-    push_cmd = 'git push origin'
-    if config.getboolean('Proxy', 'disable_ssl_verify'):
-        push_cmd = 'git -c http.sslVerify=false push origin'
+    # 获取本地和远程的差异；多分支模式下只推送领先远程的分支
+    behind = 0
+    branches = []
+    for name, local_sha, remote_sha in targets:
+        prefix = f"{name}: " if patterns else ''
+        if remote_sha:
+            ahead_behind, _, _ = run_command(
+                ['git', 'rev-list', '--left-right', '--count', f'{remote_sha}...{local_sha}'], repo_path)
+            if ahead_behind and len(ahead_behind.split()) == 2:
+                branch_behind, ahead = map(int, ahead_behind.split())
+                if ahead > 0:
+                    logger.info(f"{prefix}本地领先远程 {ahead} 个提交")
+                if branch_behind > 0:
+                    logger.info(f"{prefix}本地落后远程 {branch_behind} 个提交")
+                if name == branch:
+                    behind = branch_behind
+                if patterns and ahead == 0:
+                    continue
+        branches.append(name)
+    if not branches:
+        logger.info("没有领先远程的分支，跳过推送")
+        inc_metric('push_skipped_total', **labels)
+        result.update(ok=True, error_kind=None)
+        return result
+    
+    # 推送到远程仓库，多个分支共用一次连接
+    logger.info(f"正在推送到远程仓库 (分支: {', '.join(branches)})")
+    push_cmd = ['git', 'push', remote] + branches
     if force_push:
-        push_cmd += f' {branch} -f'
+        push_cmd.append('-f')
         logger.info("使用强制推送模式")
-    else:
-        push_cmd += f' {branch}'
+    elif mirror:
+        push_cmd += [f'--force-with-lease=refs/heads/{name}' for name in branches]
     
-    push_output, push_error, push_code = run_command(push_cmd, repo_path)
+    if sync and behind > 0 and branches == [branch]:
+        # 已知远程分支有新的提交，先同步再推送
+        push_output, push_error, push_code, error_kind = '', '', 1, 'non_fast_forward'
+        rejected = [branch]
+    else:
+        push_output, push_error, push_code, error_kind = push_with_retry(repo_path, push_cmd, config)
+        rejected = rejected_branches(push_error) if push_code != 0 else []
+    if sync and error_kind == 'non_fast_forward' and (not patterns or branch in rejected):
+        remote_sha, sync_error = sync_with_remote(repo_path, remote, branch, config)
+        if sync_error:
+            push_error, error_kind = '同步远程分支失败', sync_error
+        else:
+            result['synced'] = True
+            result['local_sha'] = read_ref(repo_path, f'refs/heads/{branch}')
+            # 只在远程分支仍是刚拉取的提交时覆盖，避免丢失同步期间别人推送的提交
+            first_error = push_error
+            push_output, push_error, push_code, error_kind = push_with_retry(
+                repo_path, ['git', 'push', remote, branch, f'--force-with-lease=refs/heads/{branch}:{remote_sha}'], config)
+            if push_code == 0 and len(rejected) > 1:
+                # 其他被拒绝的分支不在这里同步，仍按失败处理
+                push_error, push_code, error_kind = first_error, 1, classify_push_error(first_error, 1)
     if push_code != 0:
-        logger.error(f"推送失败: {push_error}")
+        logger.error(f"推送失败（{PUSH_ERROR_DESC[error_kind]}）: {push_error}")
+        record_stage_failure(repo_path, 'push')
+        inc_metric('pushes_total', result='failure', **labels)
+        inc_metric('push_failures_total', reason=error_kind, **labels)
+        invalidate_connection_cache()
+        result['error_kind'] = error_kind
+        return result
+    
+    if push_output:
+        logger.info(f"推送输出:\n{truncate_lines(push_output, config.getint('Log', 'max_file_lines', fallback=50))}")
+    logger.info("成功推送到GitHub" if remote == 'origin' else f"成功推送到 {remote}")
+    inc_metric('pushes_total', result='success', **labels)
+    result.update(ok=True, error_kind=None)
+    return result
+
+def record_change_metrics(repo_path, changes):
+    """记录一次提交涉及的文件数、行数和体积"""
+    repo = repo_label(repo_path)
+    inc_metric('commits_total', repo=repo)
+    inc_metric('files_changed_total', len(changes.entries), repo=repo)
+    totals = changes.line_totals()
+    if totals:
+        inc_metric('lines_added_total', totals[0], repo=repo)
+        inc_metric('lines_removed_total', totals[1], repo=repo)
+    observe_metric('commit_size_bytes', estimate_change_size(repo_path, changes), buckets=SIZE_BUCKETS, repo=repo)
+
+def get_branch_refs(repo_path, remote, branch):
+    """一次 for-each-ref 读取本地分支和远程跟踪分支的提交，不存在时为 None"""
+    local_ref = f'refs/heads/{branch}'
+    remote_ref = f'refs/remotes/{remote}/{branch}'
+    output, _, code = run_command(
+        ['git', 'for-each-ref', '--format=%(refname) %(objectname)', local_ref, remote_ref], repo_path)
+    refs = {}
+    if code == 0:
+        for line in output.splitlines():
+            name, _, sha = line.rpartition(' ')
+            refs[name] = sha
+    return refs.get(local_ref), refs.get(remote_ref)
+
+def select_push_branches(repo_path, remote, patterns):
+    """一次 for-each-ref 找出名称匹配任一通配符的本地分支
+
+    返回 [(分支, 本地提交, 远程跟踪分支的提交)]，没有远程跟踪分支时为 None。
+    """
+    output, _, code = run_command(
+        ['git', 'for-each-ref', '--format=%(refname) %(objectname)', 'refs/heads', f'refs/remotes/{remote}'], repo_path)
+    local, tracking = {}, {}
+    remote_prefix = f'refs/remotes/{remote}/'
+    for line in output.splitlines() if code == 0 else []:
+        ref, _, sha = line.rpartition(' ')
+        if ref.startswith('refs/heads/'):
+            local[ref[len('refs/heads/'):]] = sha
+        elif ref.startswith(remote_prefix):
+            tracking[ref[len(remote_prefix):]] = sha
+    return [
+        (name, sha, tracking.get(name)) for name, sha in sorted(local.items())
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+    ]
+
+def rejected_branches(error):
+    """从 git push 的错误输出中找出被拒绝的分支（" ! [rejected]  a -> a (...)"）"""
+    branches = []
+    for line in error.splitlines():
+        if not line.startswith(' ! ['):
+            continue
+        refs = line.split(']', 1)[1].split(' (', 1)[0].split(' -> ')
+        if len(refs) == 2:
+            branches.append(refs[1].strip())
+    return branches
+
+def get_remote_heads(repo_path, remote, branches):
+    """用一次 git ls-remote 读取多个远程分支的最新提交，返回 {分支: 提交}，失败时为 None"""
+    output, error, code = run_command(
+        ['git', 'ls-remote', remote] + [f'refs/heads/{branch}' for branch in branches],
+        repo_path, env=git_network_env(load_config(), repo_path))
+    if code != 0:
+        logger.warning(f"读取远程分支失败: {error.strip()}")
+        return None
+    heads = {}
+    for line in output.splitlines():
+        sha, _, ref = line.partition('\t')
+        if ref.startswith('refs/heads/') and ref[len('refs/heads/'):] in branches:
+            heads[ref[len('refs/heads/'):]] = sha
+    return heads
+
+# 推送失败的分类，按顺序匹配 LC_ALL=C 下 git 的英文错误信息
+PUSH_ERROR_PATTERNS = (
+    ('auth', (
+        'Authentication failed', 'Permission denied', 'could not read Username',
+        'could not read Password', 'Invalid username or password', 'terminal prompts disabled',
+        'HTTP Basic: Access denied', 'returned error: 401', 'returned error: 403',
+        'Repository not found', 'does not appear to be a git repository',
+    )),
+    ('hook', (
+        'hook declined', 'remote rejected', 'GH006', 'GH013', 'protected branch',
+    )),
+    ('non_fast_forward', (
+        'non-fast-forward', 'fetch first', 'Updates were rejected', 'stale info',
+    )),
+    ('network', (
+        'Could not resolve host', 'Could not resolve hostname', 'Connection timed out',
+        'Connection refused', 'Connection reset', 'Connection closed', 'Failed to connect',
+        'Operation timed out', 'Network is unreachable', 'unable to access',
+        'remote end hung up', 'early EOF', 'RPC failed', 'SSL', 'gnutls', 'TLS',
+        'returned error: 5', 'Could not read from remote repository',
+    )),
+)
+
+PUSH_ERROR_DESC = {
+    'auth': '认证或权限错误',
+    'hook': '被远程钩子拒绝',
+    'non_fast_forward': '远程分支有新的提交',
+    'conflict': '与远程分支冲突',
+    'network': '网络错误',
+    'unknown': '未知错误',
+}
+
+# 可以在本轮内直接重试的错误；需要人工处理的错误会暂停推送，直到配置被修改
+TRANSIENT_PUSH_ERRORS = ('network', 'unknown')
+PERMANENT_PUSH_ERRORS = ('auth', 'hook', 'non_fast_forward', 'conflict')
+
+def classify_push_error(error, code):
+    """根据返回码和标准错误判断推送失败的类型"""
+    if code == TIMEOUT_RETURN_CODE:
+        return 'network'
+    for kind, patterns in PUSH_ERROR_PATTERNS:
+        if any(pattern in error for pattern in patterns):
+            return kind
+    return 'unknown'
+
+def backoff_delay(base, attempt, limit):
+    """第 attempt 次失败后的等待时间：指数增长，上限为 limit，并在后一半范围内随机抖动"""
+    delay = min(limit, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def sync_with_remote(repo_path, remote, branch, config):
+    """拉取远程分支，并把本地提交变基（或合并）到远程分支上
+
+    只拉取目标分支且不拉取标签；发生冲突时放弃变基或合并，工作区恢复原状。
+    返回 (拉取到的远程分支提交, 错误类型)，成功时错误类型为 None。
+    """
+    mode = config['Sync']['mode']
+    env = git_network_env(config, repo_path)
+    
+    logger.info(f"远程分支有新的提交，正在拉取 {remote}/{branch}")
+    fetch_cmd = ['git', 'fetch', '--no-tags', '--no-recurse-submodules']
+    fetch_filter = config['Sync']['fetch_filter'].strip()
+    if fetch_filter:
+        fetch_cmd.append(f'--filter={fetch_filter}')
+    fetch_cmd += [remote, f'+refs/heads/{branch}:refs/remotes/{remote}/{branch}']
+    with stage_timer(repo_path, 'fetch'):
+        _, fetch_error, fetch_code = run_command(
+            fetch_cmd, repo_path, timeout=config.getfloat('Git', 'push_timeout', fallback=600), env=env)
+    if fetch_code != 0:
+        logger.error(f"拉取远程分支失败: {fetch_error}")
+        return None, classify_push_error(fetch_error, fetch_code)
+    remote_sha = read_ref(repo_path, f'refs/remotes/{remote}/{branch}')
+    if remote_sha is None:
+        logger.error(f"远程分支不存在: {remote}/{branch}")
+        return None, 'unknown'
+    
+    if mode == 'merge':
+        sync_cmd = ['git', 'merge', '--no-edit', f'refs/remotes/{remote}/{branch}']
+        abort_cmd = ['git', 'merge', '--abort']
+    else:
+        sync_cmd = ['git', 'rebase', '--autostash', f'refs/remotes/{remote}/{branch}']
+        abort_cmd = ['git', 'rebase', '--abort']
+    logger.info(f"正在{'合并' if mode == 'merge' else '变基'}到 {remote}/{branch} ({remote_sha[:7]})")
+    with stage_timer(repo_path, 'sync'):
+        _, sync_error, sync_code = run_command(sync_cmd, repo_path, env=env)
+    if sync_code != 0:
+        logger.error(f"同步时发生冲突，已放弃{'合并' if mode == 'merge' else '变基'}: {sync_error}")
+        run_command(abort_cmd, repo_path)
+        record_stage_failure(repo_path, 'sync')
+        return remote_sha, 'conflict'
+    return remote_sha, None
+
+class PushProgress:
+    """解析 git push --progress 的标准错误，记录对象数、字节数和速率
+
+    进度行以 \r 原地刷新，只保留以 \n 结束的完整行作为推送的错误输出。
+    对象数、字节数、阶段变化或出现新的输出行都视为有进展。
+    """
+    SIZE_UNITS = {'bytes': 1, 'byte': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3}
+    MAX_LINES = 200
+
+    def __init__(self, repo, remote):
+        self.repo = repo
+        self.remote = remote
+        self.phase = None
+        self.percent = None
+        self.objects = 0
+        self.total_objects = None
+        self.bytes = 0
+        self.throughput = None
+        self.started = self.last_advance = time.monotonic()
+        self.lines = []
+        self._buffer = b''
+        self._lock = threading.Lock()
+
+    def feed(self, chunk):
+        """stream_command 的 on_stderr 回调"""
+        with self._lock:
+            data = self._buffer + chunk
+            start = 0
+            for index, byte in enumerate(data):
+                if byte in (10, 13):
+                    self._parse_line(data[start:index].decode('utf-8', 'replace'), byte == 10)
+                    start = index + 1
+            self._buffer = data[start:]
+
+    def _parse_line(self, line, complete):
+        line = line.rstrip()
+        if not line:
+            return
+        if complete:
+            self.lines.append(line)
+            del self.lines[:-self.MAX_LINES]
+            self.last_advance = time.monotonic()
+        text = line[len('remote: '):] if line.startswith('remote: ') else line
+        phase, _, rest = text.partition(': ')
+        rest = rest.strip()
+        if not rest or not rest[0].isdigit():
+            return
+        before = (self.phase, self.objects, self.bytes)
+        if phase != self.phase:
+            self.phase, self.percent, self.objects, self.total_objects = phase, None, 0, None
+        counts, _, transfer = rest.partition('), ')
+        try:
+            if '(' in counts:
+                percent, _, counts = counts.partition('(')
+                self.percent = int(percent.strip().rstrip('%') or 0)
+                done, _, total = counts.split(')')[0].partition('/')
+                self.objects, self.total_objects = int(done), int(total or 0)
+            else:
+                self.objects = int(counts.split(',')[0])
+        except ValueError:
+            return
+        if transfer:
+            size, _, rate = transfer.split(', done')[0].partition('|')
+            self.bytes = self._parse_size(size) or self.bytes
+            self.throughput = self._parse_size(rate.replace('/s', '')) or self.throughput
+        if (self.phase, self.objects, self.bytes) != before:
+            self.last_advance = time.monotonic()
+
+    @classmethod
+    def _parse_size(cls, text):
+        value, _, unit = text.strip().partition(' ')
+        try:
+            return float(value) * cls.SIZE_UNITS[unit]
+        except (ValueError, KeyError):
+            return None
+
+    def idle_seconds(self):
+        return time.monotonic() - self.last_advance
+
+    def error_text(self):
+        with self._lock:
+            return '\n'.join(self.lines + ([self._buffer.decode('utf-8', 'replace')] if self._buffer else []))
+
+    def snapshot(self):
+        """当前进度的字典形式，用于指标快照"""
+        return {
+            'repo': self.repo, 'remote': self.remote, 'phase': self.phase, 'percent': self.percent,
+            'objects': self.objects, 'total_objects': self.total_objects, 'bytes': self.bytes,
+            'throughput': self.throughput, 'elapsed': round(time.monotonic() - self.started, 3),
+            'idle': round(self.idle_seconds(), 3)
+        }
+
+    def describe(self):
+        if self.phase is None:
+            return "等待远程仓库响应"
+        text = self.phase
+        if self.percent is not None:
+            text += f" {self.percent}% ({self.objects}/{self.total_objects})"
+        else:
+            text += f" {self.objects}"
+        if self.bytes:
+            text += f"，{self.bytes / 1024 / 1024:.1f}MB"
+        if self.throughput:
+            text += f"，{self.throughput / 1024 / 1024:.2f}MB/s"
+        return text
+
+# 正在进行的推送：(仓库, 远程仓库) -> PushProgress
+_active_pushes = {}
+_active_pushes_lock = threading.Lock()
+
+# 推送进行中每隔多少秒输出一次进度
+PUSH_PROGRESS_LOG_SECONDS = 10
+
+def run_push(repo_path, push_cmd, config, timeout, env):
+    """以 --progress 流式执行 git push，记录进度，超过 [Git] push_stall_seconds 没有进展时终止
+
+    返回 (标准输出, 标准错误, 返回码)。
+    """
+    remote = push_cmd[2]
+    progress = PushProgress(repo_label(repo_path), remote)
+    stall_seconds = config.getfloat('Git', 'push_stall_seconds', fallback=120)
+    output = []
+    last_log = [time.monotonic()]
+    
+    def watchdog():
+        if stall_seconds and progress.idle_seconds() > stall_seconds:
+            inc_metric('push_stalls_total', repo=progress.repo, remote=remote)
+            return f"推送停滞（{stall_seconds:g}秒没有进展），已终止"
+        if time.monotonic() - last_log[0] >= PUSH_PROGRESS_LOG_SECONDS:
+            last_log[0] = time.monotonic()
+            logger.info(f"推送进度: {progress.describe()}")
+        return None
+    
+    key = (progress.repo, remote)
+    with _active_pushes_lock:
+        _active_pushes[key] = progress
+    try:
+        error, code = stream_command(
+            push_cmd[:2] + ['--progress'] + push_cmd[2:], repo_path, on_stdout=output.append,
+            on_stderr=progress.feed, timeout=timeout, env=env, watchdog=watchdog)
+    finally:
+        with _active_pushes_lock:
+            _active_pushes.pop(key, None)
+    return b''.join(output).decode('utf-8', 'replace'), (progress.error_text() + error).strip(), code
+
+def push_with_retry(repo_path, push_cmd, config):
+    """执行推送，网络等瞬时错误（包括推送停滞）在本轮内按抖动的指数退避重试
+
+    返回 (标准输出, 标准错误, 返回码, 错误类型)，成功时错误类型为 None。
+    """
+    attempts = max(1, config.getint('Retry', 'max_attempts', fallback=3))
+    base = config.getfloat('Retry', 'base_seconds', fallback=2)
+    limit = config.getfloat('Retry', 'max_seconds', fallback=60)
+    timeout = config.getfloat('Git', 'push_timeout', fallback=600)
+    env = git_network_env(config, repo_path)
+    
+    for attempt in range(1, attempts + 1):
+        with stage_timer(repo_path, 'push'):
+            output, error, code = run_push(repo_path, push_cmd, config, timeout, env)
+        if code == 0:
+            return output, error, code, None
+        
+        kind = classify_push_error(error, code)
+        if kind not in TRANSIENT_PUSH_ERRORS or attempt == attempts:
+            return output, error, code, kind
+        delay = backoff_delay(base, attempt, limit)
+        logger.warning(f"推送失败（{PUSH_ERROR_DESC[kind]}），{delay:.1f} 秒后进行第 {attempt + 1} 次尝试")
+        inc_metric('push_retries_total', repo=repo_label(repo_path), reason=kind)
+        time.sleep(delay)
+
+# 批量推送状态：仓库路径 -> {'first_time', 'commits', 'size', 'head'}
+_batch_state = {}
+_batch_lock = threading.Lock()
+
+def get_batch_policy(config):
+    """读取 [Batch] 配置，未启用时返回 None"""
+    if not config.getboolean('Batch', 'enable', fallback=False):
+        return None
+    return {
+        'squash': config['Batch']['mode'] == 'squash',
+        'max_commits': config.getint('Batch', 'max_commits', fallback=10),
+        'max_bytes': config.getfloat('Batch', 'max_size_mb', fallback=10) * 1024 * 1024,
+        'max_latency': config.getfloat('Batch', 'max_latency_minutes', fallback=30) * 60
+    }
+
+def estimate_change_size(repo_path, changes):
+    """按工作区文件大小估算变更集合的体积（不调用 git）"""
+    total = 0
+    for entry in changes.entries:
+        try:
+            total += os.lstat(os.path.join(repo_path, entry.path)).st_size
+        except OSError:
+            # 已删除的文件
+            continue
+    return total
+
+def squash_change_set(changes, previous):
+    """把 squash 模式下之前各轮合并进同一提交的变更记录与本轮合并，用于生成提交信息
+
+    previous 为 record_batch_commit 保存的记录列表。之前新增、本轮又修改的文件仍记为新增，
+    同一文件各轮的增删行数相加。被拦截而没有提交的文件不计入。
+    """
+    held = {path for path, _, _ in changes.held_back}
+    merged = ChangeSet()
+    merged.branch_oid, merged.branch_head = changes.branch_oid, changes.branch_head
+    entries = {}
+    for kind, xy, path, orig_path, added, removed in previous or []:
+        entries[path] = FileChange(kind, xy, path, orig_path)
+        if added is not None or removed is not None:
+            merged.numstat[path] = (added, removed)
+    for entry in changes.entries:
+        if entry.path in held:
+            continue
+        earlier = entries.get(entry.path)
+        if earlier is not None and change_category(earlier) in ('added', 'untracked') and change_category(entry) == 'modified':
+            entry = earlier
+        entries[entry.path] = entry
+        stat = changes.numstat.get(entry.path)
+        if stat:
+            before = merged.numstat.get(entry.path, (0, 0))
+            merged.numstat[entry.path] = tuple(
+                None if value is None else (earlier_value or 0) + value for value, earlier_value in zip(stat, before))
+    merged.entries = list(entries.values())
+    return merged
+
+def record_batch_commit(batch_key, repo_path, changes, squashed=None):
+    """记录一次尚未推送的提交；squashed 为 squash 模式下合并后的变更集合，保存下来供下一轮汇总"""
+    head_output, _, head_code = run_command(['git', 'rev-parse', 'HEAD'], repo_path)
+    size = estimate_change_size(repo_path, changes)
+    with _batch_lock:
+        state = _batch_state.setdefault(batch_key, {'first_time': time.time(), 'commits': 0, 'size': 0, 'head': None})
+        state['commits'] += 1
+        state['size'] += size
+        state['head'] = head_output.strip() if head_code == 0 else None
+        if squashed is not None:
+            state['entries'] = [
+                list(entry) + list(squashed.numstat.get(entry.path, (None, None))) for entry in squashed.entries
+            ]
+        state = dict(state)
+    update_repo_state(
+        batch_key, batch_first_time=state['first_time'], batch_commits=state['commits'],
+        batch_size=state['size'], batch_head=state['head'],
+        batch_entries=json.dumps(state['entries']) if state.get('entries') is not None else None)
+
+def clear_batch_state(batch_key):
+    """推送完成后清除批量状态"""
+    with _batch_lock:
+        had_state = _batch_state.pop(batch_key, None) is not None
+    if had_state:
+        update_repo_state(
+            batch_key, batch_first_time=None, batch_commits=0, batch_size=0, batch_head=None, batch_entries=None)
+
+def batch_due(batch_key, batch, changes):
+    """判断批量提交是否需要推送，返回 (是否到期, 原因)"""
+    with _batch_lock:
+        state = dict(_batch_state.get(batch_key) or {})
+    if not state:
+        # 进程重启后丢失了批量状态，但本地仍有未推送到主远程仓库的提交
+        config = load_config()
+        remote = push_remotes(config, batch_key)[0]
+        branch = push_branch(config, batch_key, changes)
+        ahead = changes.ahead if changes.upstream == f'{remote}/{branch}' else None
+        if ahead is None:
+            output, _, code = run_command(
+                ['git', 'rev-list', '--count', f'refs/remotes/{remote}/{branch}..HEAD'], batch_key)
+            ahead = int(output.strip()) if code == 0 and output.strip().isdigit() else 0
+        if ahead:
+            return True, f"本地有 {ahead} 个未推送的提交"
+        return False, None
+    
+    age = time.time() - state['first_time']
+    if state['commits'] >= batch['max_commits']:
+        return True, f"累计 {state['commits']} 次提交"
+    if state['size'] >= batch['max_bytes']:
+        return True, f"累计 {state['size'] / 1024 / 1024:.1f}MB"
+    if age >= batch['max_latency']:
+        return True, f"最早的提交已等待 {age / 60:.0f} 分钟"
+    logger.info(
+        f"已提交到本地，等待批量推送: {state['commits']}/{batch['max_commits']} 次提交，"
+        f"{state['size'] / 1024 / 1024:.1f}/{batch['max_bytes'] / 1024 / 1024:.0f}MB，"
+        f"剩余 {(batch['max_latency'] - age) / 60:.0f} 分钟"
+    )
+    return False, None
+
+def batch_deadline(repo_path, batch):
+    """返回仓库批量提交的最晚推送时间，没有待推送的批量提交时返回 None"""
+    with _batch_lock:
+        state = _batch_state.get(os.path.abspath(repo_path))
+        if not batch or not state:
+            return None
+        return state['first_time'] + batch['max_latency']
+
+# 每个仓库持久化保存的状态字段
+STATE_COLUMNS = (
+    ('last_pushed_sha', 'TEXT'),
+    ('last_head', 'TEXT'),
+    ('last_index_mtime', 'INTEGER'),
+    ('last_tree_fingerprint', 'TEXT'),
+    ('last_scan', 'REAL'),
+    ('last_clean', 'INTEGER'),
+    ('batch_first_time', 'REAL'),
+    ('batch_commits', 'INTEGER DEFAULT 0'),
+    ('batch_size', 'INTEGER DEFAULT 0'),
+    ('batch_head', 'TEXT'),
+    ('batch_entries', 'TEXT'),
+    ('ignored_paths', 'TEXT'),
+    ('ignore_signature', 'TEXT'),
+)
+STATE_FIELDS = tuple(name for name, _ in STATE_COLUMNS)
+
+# 每个 (仓库, 远程仓库) 持久化保存的推送失败状态，一个远程仓库失败不影响其他远程仓库
+REMOTE_STATE_COLUMNS = (
+    ('failures', 'INTEGER DEFAULT 0'),
+    ('backoff_until', 'REAL DEFAULT 0'),
+    ('parked_reason', 'TEXT'),
+    ('parked_config', 'TEXT'),
+    ('parked_refs', 'TEXT'),
+)
+REMOTE_STATE_FIELDS = tuple(name for name, _ in REMOTE_STATE_COLUMNS)
+
+# SQLite 状态库连接，所有线程共用，通过锁串行访问
+_state_store = {'conn': None, 'file': None}
+_state_lock = threading.RLock()
+
+def _state_connection():
+    """打开 [State] file 指定的状态库，配置为空时返回 None"""
+    import sqlite3
+    state_file = load_config()['State']['file'].strip()
+    if not state_file:
+        return None
+    if _state_store['conn'] is not None and _state_store['file'] == state_file:
+        return _state_store['conn']
+    
+    conn = sqlite3.connect(state_file, timeout=30, check_same_thread=False, isolation_level=None)
+    # WAL 模式下写入中断不会损坏已有数据
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS repo_state (path TEXT PRIMARY KEY, updated_at REAL)')
+    # 旧版本创建的状态库缺少的字段在这里补上
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(repo_state)')}
+    for name, column_type in STATE_COLUMNS:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE repo_state ADD COLUMN {name} {column_type}')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS remote_state (path TEXT, remote TEXT, updated_at REAL, PRIMARY KEY (path, remote))')
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(remote_state)')}
+    for name, column_type in REMOTE_STATE_COLUMNS:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE remote_state ADD COLUMN {name} {column_type}')
+    _state_store.update(conn=conn, file=state_file)
+    
+    # 恢复上次运行时尚未推送的批量提交
+    rows = conn.execute(
+        'SELECT path, batch_first_time, batch_commits, batch_size, batch_head, batch_entries FROM repo_state '
+        'WHERE batch_commits > 0').fetchall()
+    with _batch_lock:
+        for path, first_time, commits, size, head, entries in rows:
+            _batch_state.setdefault(path, {
+                'first_time': first_time, 'commits': commits, 'size': size, 'head': head,
+                'entries': json.loads(entries) if entries else None
+            })
+    return conn
+
+def get_repo_state(repo_path):
+    """读取仓库的持久化状态，没有记录时各字段为 None"""
+    with _state_lock:
+        conn = _state_connection()
+        row = None
+        if conn is not None:
+            row = conn.execute(
+                f"SELECT {', '.join(STATE_FIELDS)} FROM repo_state WHERE path = ?",
+                (os.path.abspath(repo_path),)).fetchone()
+    return dict(zip(STATE_FIELDS, row or (None,) * len(STATE_FIELDS)))
+
+def update_repo_state(repo_path, **fields):
+    """更新仓库的持久化状态"""
+    with _state_lock:
+        conn = _state_connection()
+        if conn is None:
+            return
+        path = os.path.abspath(repo_path)
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        conn.execute('INSERT OR IGNORE INTO repo_state (path) VALUES (?)', (path,))
+        conn.execute(
+            f'UPDATE repo_state SET {assignments}, updated_at = ? WHERE path = ?',
+            tuple(fields.values()) + (time.time(), path))
+
+def get_remote_states(repo_path):
+    """读取仓库各远程仓库的推送失败状态，返回 {远程仓库名: 状态}，没有失败记录的远程仓库不在其中"""
+    with _state_lock:
+        conn = _state_connection()
+        rows = []
+        if conn is not None:
+            rows = conn.execute(
+                f"SELECT remote, {', '.join(REMOTE_STATE_FIELDS)} FROM remote_state WHERE path = ?",
+                (os.path.abspath(repo_path),)).fetchall()
+    return {row[0]: dict(zip(REMOTE_STATE_FIELDS, row[1:])) for row in rows}
+
+def update_remote_state(repo_path, remote, **fields):
+    """更新仓库某个远程仓库的推送失败状态"""
+    with _state_lock:
+        conn = _state_connection()
+        if conn is None:
+            return
+        path = os.path.abspath(repo_path)
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        conn.execute('INSERT OR IGNORE INTO remote_state (path, remote) VALUES (?, ?)', (path, remote))
+        conn.execute(
+            f'UPDATE remote_state SET {assignments}, updated_at = ? WHERE path = ? AND remote = ?',
+            tuple(fields.values()) + (time.time(), path, remote))
+
+def clear_push_failure(repo_path, remote):
+    """推送成功后删除该远程仓库的失败记录"""
+    with _state_lock:
+        conn = _state_connection()
+        if conn is not None:
+            conn.execute('DELETE FROM remote_state WHERE path = ? AND remote = ?', (os.path.abspath(repo_path), remote))
+
+def config_fingerprint():
+    """当前配置内容的指纹，用于判断暂停推送后配置是否被修改"""
+    load_config()
+    with _config_lock:
+        return hashlib.blake2b(_config_cache['text'].encode('utf-8'), digest_size=8).hexdigest()
+
+def push_refs_signature(config, repo_path, remote):
+    """推送分支和它在远程仓库的跟踪分支当前指向的提交，只读取 ref 文件"""
+    branch = push_branch(config, repo_path)
+    refs = (f'refs/heads/{branch}', f'refs/remotes/{remote}/{branch}')
+    return ','.join(read_ref(repo_path, ref) or '-' for ref in refs)
+
+def record_push_failure(repo_path, remote, error_kind, config):
+    """记录推送到某个远程仓库失败
+
+    需要人工处理的错误暂停推送到该远程仓库，直到配置被修改或本地分支、远程跟踪分支
+    发生变化（如手动拉取或提交）；其他错误按连续失败次数指数增加退避时间（带随机抖动）。
+    其他远程仓库照常推送。
+    """
+    state = get_remote_states(repo_path).get(remote) or {}
+    failures = (state.get('failures') or 0) + 1
+    if error_kind in PERMANENT_PUSH_ERRORS:
+        update_remote_state(repo_path, remote, failures=failures, parked_reason=error_kind,
+                            parked_config=config_fingerprint(), parked_refs=push_refs_signature(config, repo_path, remote))
+        logger.error(f"推送到 {remote} 已暂停（{PUSH_ERROR_DESC[error_kind]}），处理后（拉取、提交或修改配置文件）即可恢复")
+        return
+    
+    delay = backoff_delay(
+        config.getfloat('Retry', 'backoff_seconds', fallback=60), failures,
+        config.getfloat('Retry', 'max_backoff_seconds', fallback=3600))
+    update_remote_state(repo_path, remote, failures=failures, backoff_until=time.time() + delay)
+    logger.warning(f"推送到 {remote} 连续失败 {failures} 次，{delay:.0f} 秒内不再尝试")
+
+def push_blocked(repo_path, remote, state):
+    """远程仓库因失败退避或暂停而不应推送时返回原因，否则返回 None；state 为该远程仓库的失败状态"""
+    if not state:
+        return None
+    if state['parked_config']:
+        if state['parked_config'] != config_fingerprint():
+            logger.info(f"配置已修改，恢复推送到 {remote}")
+        elif state['parked_refs'] != push_refs_signature(load_config(), repo_path, remote):
+            logger.info(f"本地分支或 {remote} 的跟踪分支已变化，恢复推送")
+        else:
+            return f"推送已暂停（{PUSH_ERROR_DESC.get(state['parked_reason'], '未知错误')}），拉取、提交或修改配置后恢复"
+        update_remote_state(repo_path, remote, parked_reason=None, parked_config=None, parked_refs=None, backoff_until=0)
+        state.update(parked_reason=None, parked_config=None, parked_refs=None, backoff_until=0)
+    if state['backoff_until'] and state['backoff_until'] > time.time():
+        return f"推送失败后退避中，{state['backoff_until'] - time.time():.0f} 秒后重试"
+    return None
+
+def blocked_remotes(config, repo_path):
+    """返回 {远程仓库名: 原因}，只包含当前因失败退避或暂停而不应推送的远程仓库"""
+    states = get_remote_states(repo_path)
+    if not states:
+        return {}
+    blocked = {}
+    for remote in push_remotes(config, repo_path):
+        reason = push_blocked(repo_path, remote, states.get(remote))
+        if reason:
+            blocked[remote] = reason
+    return blocked
+
+def repo_blocked(repo_path):
+    """仓库的所有远程仓库都因失败退避或暂停而不应推送时返回原因，否则返回 None"""
+    config = load_config()
+    blocked = blocked_remotes(config, repo_path)
+    if blocked and len(blocked) == len(push_remotes(config, repo_path)):
+        return '; '.join(f"{remote}: {reason}" for remote, reason in blocked.items())
+    return None
+
+def push_retry_due(repo_path):
+    """有远程仓库之前推送失败且退避已结束（或暂停已解除）时返回 True，需要再推送一次"""
+    config = load_config()
+    states = get_remote_states(repo_path)
+    return any(states[remote]['failures'] and not push_blocked(repo_path, remote, states[remote])
+               for remote in push_remotes(config, repo_path) if remote in states)
+
+def resolve_git_dir(repo_path):
+    """返回仓库的 .git 目录（兼容 worktree 和子模块的 .git 文件）"""
+    dot_git = os.path.join(repo_path, '.git')
+    if os.path.isfile(dot_git):
+        with open(dot_git, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if content.startswith('gitdir:'):
+            return os.path.normpath(os.path.join(repo_path, content[len('gitdir:'):].strip()))
+    return dot_git
+
+def current_branch(repo_path):
+    """读取 .git/HEAD 得到当前检出的分支名，分离 HEAD 时返回 None"""
+    try:
+        with open(os.path.join(resolve_git_dir(repo_path), 'HEAD'), 'r', encoding='utf-8') as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    return head[len('ref: refs/heads/'):] if head.startswith('ref: refs/heads/') else None
+
+def read_ref(repo_path, ref):
+    """直接读取 .git 中的文件获得引用指向的提交，不启动 git 进程"""
+    git_dir = resolve_git_dir(repo_path)
+    try:
+        if ref == 'HEAD':
+            with open(os.path.join(git_dir, 'HEAD'), 'r', encoding='utf-8') as f:
+                head = f.read().strip()
+            if not head.startswith('ref: '):
+                return head
+            ref = head[len('ref: '):]
+        
+        common_dir = git_dir
+        if os.path.exists(os.path.join(git_dir, 'commondir')):
+            with open(os.path.join(git_dir, 'commondir'), 'r', encoding='utf-8') as f:
+                common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+        for base in (git_dir, common_dir):
+            ref_file = os.path.join(base, *ref.split('/'))
+            if os.path.isfile(ref_file):
+                with open(ref_file, 'r', encoding='utf-8') as f:
+                    return f.read().strip()
+        with open(os.path.join(common_dir, 'packed-refs'), 'r', encoding='utf-8') as f:
+            for line in f:
+                sha, _, name = line.strip().partition(' ')
+                if name == ref:
+                    return sha
+    except OSError:
+        pass
+    return None
+
+def index_mtime(repo_path):
+    """返回 .git/index 的修改时间（纳秒）"""
+    try:
+        return os.stat(os.path.join(resolve_git_dir(repo_path), 'index')).st_mtime_ns
+    except OSError:
+        return None
+
+def record_cycle_state(repo_path, changes, tree_fingerprint=None):
+    """一轮推送流程结束后记录扫描时间、HEAD、索引的修改时间和工作区指纹
+
+    tree_fingerprint 需要在 git status 之前计算，这样扫描期间发生的修改会在下一轮被发现。
+    """
+    head = read_ref(repo_path, 'HEAD')
+    fields = {
+        'last_tree_fingerprint': tree_fingerprint,
+        'last_scan': changes.scanned_at,
+        'last_clean': int(not changes.held_back),
+        'last_head': head,
+        'last_index_mtime': index_mtime(repo_path)
+    }
+    last_fingerprint = get_repo_state(repo_path)['last_tree_fingerprint'] if changes.empty else None
+    if last_fingerprint and tree_fingerprint != last_fingerprint:
+        # 指纹变化但 git 没有发现更改，多半是新出现了被忽略的路径，下一轮重新获取忽略路径
+        fields['ignore_signature'] = None
+    # HEAD 与所有远程仓库的跟踪分支一致时视为已推送
+    config = load_config()
+    branch = push_branch(config, repo_path, changes)
+    if head and all(head == read_ref(repo_path, f'refs/remotes/{remote}/{branch}')
+                    for remote in push_remotes(config, repo_path)):
+        fields['last_pushed_sha'] = head
+    update_repo_state(repo_path, **fields)
+
+def repo_unchanged(repo_path, state):
+    """不启动 git，根据持久化状态预先判断仓库自上一轮以来是否没有任何变化
+
+    依次比较 HEAD、.git/index 的修改时间和工作区的 mtime 指纹，只需要读文件和 stat。
+    返回 (是否未变化, 工作区指纹)，指纹在仓库需要检查时传给 record_cycle_state。
+    """
+    fingerprint = tree_fingerprint(repo_path, state)
+    if not state['last_clean'] or not state['last_tree_fingerprint'] or state['batch_commits']:
+        return False, fingerprint
+    if push_retry_due(repo_path):
+        return False, fingerprint
+    head = read_ref(repo_path, 'HEAD')
+    if head is None or head != state['last_head'] or head != state['last_pushed_sha']:
+        return False, fingerprint
+    if index_mtime(repo_path) != state['last_index_mtime']:
+        return False, fingerprint
+    return fingerprint is not None and fingerprint == state['last_tree_fingerprint'], fingerprint
+
+def tree_fingerprint(repo_path, state):
+    """计算预检查使用的工作区指纹，排除被忽略的路径以及本程序自己的状态库和日志
+
+    被忽略的路径缓存在状态库中，只有 .gitignore 或 .git/info/exclude 的修改时间变化时
+    才重新执行 git ls-files 获取。
+    """
+    own_files, own_prefixes = own_file_paths(load_config(), repo_path)
+    ignored = set(json.loads(state['ignored_paths'])) if state['ignored_paths'] is not None else None
+    signature = state['ignore_signature']
+    for _ in range(2):
+        gitignores = []
+        fingerprint = scan_tree_fingerprint(repo_path, (ignored or set()) | own_files, own_prefixes, gitignores)
+        current = ignore_signature(repo_path, gitignores)
+        if ignored is not None and current == signature:
+            break
+        ignored, signature = get_ignored_paths(repo_path), current
+        update_repo_state(repo_path, ignored_paths=json.dumps(sorted(ignored)), ignore_signature=signature)
+    return fingerprint
+
+def ignore_signature(repo_path, gitignores):
+    """由各 .gitignore 和 .git/info/exclude 的修改时间计算的签名"""
+    digest = hashlib.blake2b(digest_size=16)
+    for rel_path, mtime in sorted(gitignores):
+        digest.update(f"{rel_path}\0{mtime}\n".encode('utf-8', 'surrogateescape'))
+    try:
+        digest.update(str(os.stat(os.path.join(resolve_git_dir(repo_path), 'info', 'exclude')).st_mtime_ns).encode())
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+def own_file_paths(config, repo_path):
+    """位于工作区中的状态库和日志文件的相对路径，以及它们的 -wal / 轮转文件的前缀"""
+    root = os.path.abspath(repo_path) + os.sep
+    files, prefixes = set(), []
+    for path in (config['State']['file'].strip(), config['Log']['file'].strip()):
+        path = os.path.abspath(path) if path else ''
+        if path.startswith(root):
+            rel_path = path[len(root):].replace(os.sep, '/')
+            files.add(rel_path)
+            prefixes += [rel_path + '.', rel_path + '-']
+    return files, tuple(prefixes)
+
+def split_list(value):
+    """拆分以逗号或换行分隔的配置值"""
+    return [item.strip() for item in value.replace('\n', ',').split(',') if item.strip()]
+
+def get_repo_paths(config):
+    """获取需要推送的仓库列表
+
+    合并 [Repos] 中的 paths、glob 和 manifest（每行一个路径，# 开头为注释），
+    都未配置时回退到 [Git] work_dir。
+    """
+    repos = config['Repos']
+    candidates = list(split_list(repos['paths']))
+    
+    for pattern in split_list(repos['glob']):
+        matches = sorted(glob.glob(os.path.expanduser(pattern)))
+        candidates.extend(path for path in matches if os.path.exists(os.path.join(path, '.git')))
+    
+    manifest = repos['manifest'].strip()
+    if manifest:
+        try:
+            with open(os.path.expanduser(manifest), 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        candidates.append(line)
+        except OSError as e:
+            logger.error(f"读取仓库清单失败: {manifest}: {str(e)}")
+    
+    if not candidates and config['Git']['work_dir']:
+        candidates.append(config['Git']['work_dir'])
+    
+    # 去重并保持顺序
+    repo_paths = []
+    seen = set()
+    for path in candidates:
+        path = os.path.abspath(os.path.expanduser(path))
+        key = os.path.normcase(os.path.realpath(path))
+        if key not in seen:
+            seen.add(key)
+            repo_paths.append(path)
+    return repo_paths
+
+def push_repo(repo_path, changes=None, tree_fingerprint=None):
+    """检查并推送单个仓库，异常不会影响其他仓库
+
+    changes 为空时先做不启动 git 的预检查；调用方已扫描变更时应同时传入扫描前的工作区指纹。
+    """
+    _repo_context.name = repo_label(repo_path)
+    try:
+        if not os.path.exists(repo_path):
+            logger.error(f"工作目录不存在: {repo_path}")
+            return False
+        
+        blocked = repo_blocked(repo_path)
+        if blocked:
+            logger.info(blocked)
+            return False
+        state = get_repo_state(repo_path)
+        if changes is None:
+            with stage_timer(repo_path, 'precheck'):
+                unchanged, tree_fingerprint = repo_unchanged(repo_path, state)
+            if unchanged:
+                logger.debug("工作区、索引和 HEAD 都没有变化，跳过")
+                inc_metric('precheck_skipped_total', repo=repo_label(repo_path))
+                return True
+        
+        with stage_timer(repo_path, 'check'):
+            is_repo = check_git_repo(repo_path)
+        if not is_repo:
+            return False
+        return push_to_github(repo_path, changes=changes, tree_fingerprint=tree_fingerprint)
+    except Exception as e:
+        logger.error(f"推送仓库时出错: {str(e)}")
+        record_stage_failure(repo_path, 'exception')
         return False
+    finally:
+        _repo_context.name = ''
+
+def push_all_repos(config, repo_paths=None):
+    """使用有限的工作线程并发推送所有仓库（或指定的仓库）"""
+    repo_paths = repo_paths or get_repo_paths(config)
+    if not repo_paths:
+        logger.warning("没有配置需要推送的仓库")
+        return {}
+    
+    workers = max(1, min(config.getint('Repos', 'workers', fallback=4), len(repo_paths)))
+    start = time.time()
+    if workers == 1:
+        results = {path: push_repo(path) for path in repo_paths}
     else:
-        if push_output:
-            logger.info(f"推送输出:\n{push_output.strip()}")
-        logger.info("成功推送到GitHub")
-    return True
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='git-push') as executor:
+            results = dict(zip(repo_paths, executor.map(push_repo, repo_paths)))
+    
+    failed = [path for path, ok in results.items() if not ok]
+    logger.info(f"本轮推送完成: 共 {len(results)} 个仓库，失败 {len(failed)} 个，耗时 {time.time() - start:.1f}秒")
+    for path in failed:
+        logger.warning(f"推送失败的仓库: {path}")
+    return results
 
 def configure_schedule():
     """配置定时任务"""
@@ -681,10 +2919,11 @@ def configure_startup():
             with open(startup_script, 'w') as f:
                 f.write(f'@echo off\n')
                 f.write(f'cd /d "{os.path.dirname(os.path.abspath(__file__))}\"\n')
-                f.write(f'pythonw "{os.path.abspath(__file__)}" --background\n')
+                f.write(f'pythonw "{os.path.abspath(__file__)}" daemon\n')
             
             # 创建计划任务
-            cmd = f'schtasks /create /tn "GitAutoPush" /tr "{startup_script}" /sc onstart /ru "%USERNAME%" /f'
+            cmd = ['schtasks', '/create', '/tn', 'GitAutoPush', '/tr', startup_script,
+                   '/sc', 'onstart', '/ru', os.environ.get('USERNAME', ''), '/f']
             output, error, code = run_command(cmd)
             
             if code == 0:
@@ -695,7 +2934,7 @@ def configure_startup():
                 print(f"启用开机自启动失败: {error}")
         else:
             # 删除计划任务
-            cmd = 'schtasks /delete /tn "GitAutoPush" /f'
+            cmd = ['schtasks', '/delete', '/tn', 'GitAutoPush', '/f']
             output, error, code = run_command(cmd)
             
             if code == 0:
@@ -707,27 +2946,458 @@ def configure_startup():
     
     input("\n按回车键返回主菜单...")
 
-def run_schedule():
-    """运行定时任务"""
-    config = load_config()
-    if not config.getboolean('Schedule', 'enable'):
+def in_schedule_window(config):
+    """当前时间是否在定时任务的运行时间段内"""
+    current_time = datetime.now().strftime('%H:%M')
+    return config['Schedule']['start_time'] <= current_time <= config['Schedule']['end_time']
+
+def _install_stop_handlers(loop, stop_event):
+    """收到 SIGTERM / SIGINT 时设置停止事件
+
+    loop 为 None 时 stop_event 是 threading.Event，用于不运行事件循环的监听模式。
+    """
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        if loop is None:
+            signal.signal(signum, lambda *_: stop_event.set())
+            continue
+        try:
+            loop.add_signal_handler(signum, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows 事件循环不支持 add_signal_handler
+            signal.signal(signum, lambda *_: loop.call_soon_threadsafe(stop_event.set))
+
+async def _wait_for_stop(stop_event, timeout, wake_event=None):
+    """等待停止事件（或 wake_event），返回是否已收到停止信号"""
+    import asyncio
+    if wake_event is None:
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return stop_event.is_set()
+    waiters = [asyncio.ensure_future(stop_event.wait()), asyncio.ensure_future(wake_event.wait())]
+    _, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in pending:
+        waiter.cancel()
+    return stop_event.is_set()
+
+async def _schedule_repo(path, executor, semaphore, state):
+    """按计划检查并推送单个仓库
+
+    先用异步 git status 扫描；没有更改、没有待推送的批量提交且 HEAD 已推送到所有远程仓库时，
+    不再占用工作线程。
+    """
+    import asyncio
+    async with semaphore:
+        if state['stopping'] or not in_schedule_window(load_config()):
+            return
+        loop = asyncio.get_event_loop()
+        blocked = await loop.run_in_executor(executor, repo_blocked, path)
+        if blocked:
+            logger.debug(f"[{repo_label(path)}] {blocked}")
+            return
+        repo_state = await loop.run_in_executor(executor, get_repo_state, path)
+        unchanged, tree_fingerprint = await loop.run_in_executor(executor, repo_unchanged, path, repo_state)
+        if unchanged:
+            logger.debug(f"[{repo_label(path)}] 工作区、索引和 HEAD 都没有变化，跳过")
+            inc_metric('precheck_skipped_total', repo=repo_label(path))
+            return
+        with stage_timer(path, 'status'):
+            changes = await check_git_changes_async(path)
+        if changes is not None and changes.empty:
+            with _batch_lock:
+                pending_batch = os.path.abspath(path) in _batch_state
+            unpushed = pending_batch or (
+                await loop.run_in_executor(executor, unpushed_head, path, load_config(), changes))[0]
+            if not unpushed:
+                logger.debug(f"[{repo_label(path)}] 没有需要提交的更改")
+                await loop.run_in_executor(executor, record_cycle_state, path, changes, tree_fingerprint)
+                return
+        await loop.run_in_executor(executor, push_repo, path, changes, tree_fingerprint)
+
+async def run_async_scheduler(config):
+    """基于 asyncio 的定时调度：每个仓库独立计算下次运行时间，保存在最小堆中
+
+    并发数由 [Repos] workers 限制，运行时间加入 ±jitter_seconds 的随机偏移；
+    同一仓库同时只有一个任务，下次运行在本次完成后才加入堆中，错过的周期直接跳过。
+    收到 SIGTERM 后不再启动新的推送，等待进行中的推送完成后退出。
+    """
+    import asyncio
+    import concurrent.futures
+    repo_paths = get_repo_paths(config)
+    if not repo_paths:
+        logger.warning("没有配置需要推送的仓库")
         return
     
-    current_time = datetime.now().strftime('%H:%M')
-    start_time = config['Schedule']['start_time']
-    end_time = config['Schedule']['end_time']
+    interval = config.getfloat('Schedule', 'interval_minutes', fallback=60) * 60
+    jitter = min(config.getfloat('Schedule', 'jitter_seconds', fallback=30), interval / 2)
+    workers = max(1, config.getint('Repos', 'workers', fallback=4))
     
-    if start_time <= current_time <= end_time:
-        repo_path = config['Git']['work_dir']
-        if os.path.exists(repo_path):
-            if check_git_repo(repo_path):
-                push_to_github(repo_path)
+    loop = asyncio.get_event_loop()
+    stop_event = asyncio.Event()
+    _install_stop_handlers(loop, stop_event)
+    semaphore = asyncio.Semaphore(workers)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='git-push')
+    state = {'stopping': False}
+    
+    # 首次运行分散在 jitter 窗口内，避免所有仓库同时推送
+    now = time.time()
+    heap = [(now + random.uniform(0, jitter), path) for path in repo_paths]
+    heapq.heapify(heap)
+    # 进行中的任务：仓库路径 -> 任务
+    in_flight = {}
+    rescheduled = asyncio.Event()
+    logger.info(f"定时调度已启动: {len(repo_paths)} 个仓库，间隔 {interval:g} 秒，并发 {workers}")
+    
+    def reschedule(path, run_at):
+        def done(task):
+            in_flight.pop(path, None)
+            # 下次运行时间以计划时间为基准，避免长时间推送导致周期漂移；推送超过间隔时跳过错过的周期
+            next_run = run_at + interval
+            while next_run <= time.time():
+                next_run += interval
+            heapq.heappush(heap, (next_run + random.uniform(-jitter, jitter), path))
+            rescheduled.set()
+        return done
+    
+    try:
+        while heap or in_flight:
+            timeout = max(0, heap[0][0] - time.time()) if heap else None
+            rescheduled.clear()
+            if await _wait_for_stop(stop_event, timeout, rescheduled):
+                break
+            if not heap or heap[0][0] > time.time():
+                continue
+            run_at, path = heapq.heappop(heap)
+            if path in in_flight:
+                # 上一次任务还没有结束，完成后会重新安排
+                logger.debug(f"[{repo_label(path)}] 上一次推送仍在进行，跳过本次")
+                continue
+            
+            task = asyncio.ensure_future(_schedule_repo(path, executor, semaphore, state))
+            in_flight[path] = task
+            task.add_done_callback(reschedule(path, run_at))
+    finally:
+        state['stopping'] = True
+        if in_flight:
+            logger.info(f"正在等待 {len(in_flight)} 个进行中的推送完成...")
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
+        executor.shutdown(wait=True)
+        logger.info("定时调度已停止")
 
-def schedule_thread():
-    """定时任务线程"""
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+def schedule_loop(config):
+    """在新的事件循环中运行定时调度"""
+    import asyncio
+    if os.name == 'nt' and hasattr(asyncio, 'WindowsProactorEventLoopPolicy'):
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(run_async_scheduler(config))
+    finally:
+        loop.close()
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+# 单个仓库在一个静默周期内记录的最多路径数，超过后直接视为有变更
+MAX_PENDING_PATHS = 1000
+
+def get_ignored_paths(repo_path):
+    """获取被 .gitignore 忽略的未跟踪文件和目录（目录以 / 结尾）"""
+    output, _, code = run_command(['git', 'ls-files', '--others', '--ignored', '--exclude-standard', '--directory', '-z'], repo_path)
+    if code != 0 or not output:
+        return set()
+    return set(path for path in output.split('\0') if path)
+
+def is_path_ignored(rel_path, ignored):
+    """判断相对路径是否位于 .git 或已知的忽略路径中"""
+    parts = rel_path.split('/')
+    if '.git' in parts or rel_path in ignored:
+        return True
+    prefix = ''
+    for part in parts[:-1]:
+        prefix += part + '/'
+        if prefix in ignored:
+            return True
+    return False
+
+def filter_ignored_paths(repo_path, paths):
+    """用一次 git check-ignore 找出被忽略的路径"""
+    if not paths:
+        return set()
+    output, _, code = run_command(['git', 'check-ignore', '--stdin', '-z'], repo_path, input='\0'.join(paths) + '\0')
+    if code != 0 or not output:
+        return set()
+    return set(path for path in output.split('\0') if path)
+
+def scan_tree_fingerprint(repo_path, ignored=frozenset(), skip_prefixes=(), gitignores=None):
+    """用 os.scandir 递归计算工作区的 mtime 指纹，跳过 .git、忽略路径和以 skip_prefixes 开头的文件
+
+    只记录路径、文件大小和文件的修改时间，不记录目录的修改时间：文件的增删已经体现在路径中，
+    而目录的修改时间在其中被忽略的文件（日志、状态库的 -wal 文件等）增删时也会变化。
+    gitignores 为列表时，把遇到的 .gitignore 的 (相对路径, 修改时间) 加入其中。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if not os.path.isdir(repo_path):
+        return None
+    
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(repo_path, rel_dir)) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name == '.git':
+                continue
+            rel_path = rel_dir + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if rel_path + '/' in ignored:
+                        continue
+                    record = f"{rel_path}/\n"
+                    stack.append(rel_path + '/')
+                else:
+                    if rel_path in ignored or (skip_prefixes and rel_path.startswith(skip_prefixes)):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    record = f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n"
+                    if gitignores is not None and entry.name == '.gitignore':
+                        gitignores.append((rel_path, stat.st_mtime_ns))
+            except OSError:
+                continue
+            digest.update(record.encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+class PollingWatcher:
+    """轮询模式：定期比较各仓库工作区的 mtime 指纹（纯 Python，跨平台）"""
+
+    def __init__(self, repo_paths, interval):
+        self.interval = interval
+        self.ignored = {path: get_ignored_paths(path) for path in repo_paths}
+        self.fingerprints = {path: scan_tree_fingerprint(path, self.ignored[path]) for path in repo_paths}
+        self.next_scan = time.time() + interval
+
+    def refresh_ignored(self, repo_path):
+        self.ignored[repo_path] = get_ignored_paths(repo_path)
+
+    def poll(self, timeout):
+        """最多等待 timeout 秒，返回 [(仓库路径, 相对路径)]，相对路径为 None 表示整个仓库"""
+        time.sleep(max(0, min(timeout, self.next_scan - time.time())))
+        if time.time() < self.next_scan:
+            return []
+        
+        events = []
+        for repo_path, old in self.fingerprints.items():
+            new = scan_tree_fingerprint(repo_path, self.ignored[repo_path])
+            if new != old:
+                self.fingerprints[repo_path] = new
+                events.append((repo_path, None))
+        self.next_scan = time.time() + self.interval
+        return events
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """inotify 模式：递归监听各仓库的工作区目录（仅 Linux）"""
+
+    def __init__(self, repo_paths):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self._watches = {}
+        self.ignored = {}
+        try:
+            for repo_path in repo_paths:
+                self.ignored[repo_path] = get_ignored_paths(repo_path)
+                self._add_tree(repo_path, '')
+        except OSError:
+            self.close()
+            raise
+
+    def refresh_ignored(self, repo_path):
+        self.ignored[repo_path] = get_ignored_paths(repo_path)
+
+    def _add_tree(self, repo_path, rel_dir):
+        """为目录及其子目录添加监听，跳过 .git 和忽略的目录"""
+        import ctypes
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(os.path.join(repo_path, current)), WATCH_MASK)
+            if wd < 0:
+                error_code = ctypes.get_errno()
+                if error_code == errno.ENOSPC:
+                    raise OSError(error_code, 'inotify 监听数已达上限 (fs.inotify.max_user_watches)')
+                continue
+            self._watches[wd] = (repo_path, current)
+            try:
+                with os.scandir(os.path.join(repo_path, current)) as it:
+                    for entry in it:
+                        child = current + entry.name + '/'
+                        if (entry.name != '.git' and entry.is_dir(follow_symlinks=False)
+                                and child not in self.ignored[repo_path]):
+                            stack.append(child)
+            except OSError:
+                continue
+
+    def poll(self, timeout):
+        """最多等待 timeout 秒，返回 [(仓库路径, 相对路径)]，相对路径为 None 表示整个仓库"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+        
+        events = []
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b'\0'))
+            offset += 16 + length
+            
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，无法确定具体路径
+                events.extend((repo_path, None) for repo_path in self.ignored)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            watch = self._watches.get(wd)
+            if watch is None:
+                continue
+            
+            repo_path, rel_dir = watch
+            if not name:
+                events.append((repo_path, None))
+                continue
+            rel_path = rel_dir + name
+            if (mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and name != '.git'
+                    and rel_path + '/' not in self.ignored[repo_path]):
+                self._add_tree(repo_path, rel_path + '/')
+            events.append((repo_path, rel_path))
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def create_watcher(repo_paths, backend, poll_seconds):
+    """创建文件系统监听器，inotify 不可用时回退到轮询"""
+    if backend in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            watcher = InotifyWatcher(repo_paths)
+            logger.info(f"使用 inotify 监听 {len(repo_paths)} 个仓库")
+            return watcher
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify 不可用，改用轮询模式: {str(e)}")
+    logger.info(f"使用轮询模式监听 {len(repo_paths)} 个仓库，间隔 {poll_seconds} 秒")
+    return PollingWatcher(repo_paths, poll_seconds)
+
+def run_watch_loop(config):
+    """监听模式：仓库有写入且静默 debounce_seconds 后才运行推送流程
+
+    收到 SIGTERM / SIGINT 后停止监听，不再启动新的推送，等待进行中的推送完成后退出。
+    """
+    import concurrent.futures
+    repo_paths = get_repo_paths(config)
+    if not repo_paths:
+        logger.warning("没有配置需要推送的仓库")
+        return
+    
+    debounce = config.getfloat('Schedule', 'debounce_seconds', fallback=10)
+    max_delay = config.getfloat('Schedule', 'max_delay_seconds', fallback=300)
+    poll_seconds = config.getfloat('Schedule', 'poll_seconds', fallback=30)
+    watcher = create_watcher(repo_paths, config['Schedule'].get('watch_backend', 'auto'), poll_seconds)
+    workers = max(1, min(config.getint('Repos', 'workers', fallback=4), len(repo_paths)))
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='git-push')
+    stop_event = threading.Event()
+    _install_stop_handlers(None, stop_event)
+    
+    # 仓库 -> [首次事件时间, 最近事件时间, 变更路径集合]；路径集合为 None 表示无需再过滤
+    # 启动时所有仓库都视为有变更，以推送停机期间的修改
+    now = time.time()
+    pending = {path: [now - debounce, now - debounce, None] for path in repo_paths}
+    running = {}
+    try:
+        while not stop_event.is_set():
+            try:
+                events = watcher.poll(1.0)
+            except OSError as e:
+                # 运行中新建的目录无法再添加 inotify 监听（如达到 max_user_watches），与启动时一样回退到轮询
+                logger.warning(f"文件监听失败，改用轮询模式: {str(e)}")
+                watcher.close()
+                watcher = PollingWatcher(repo_paths, poll_seconds)
+                logger.info(f"使用轮询模式监听 {len(repo_paths)} 个仓库，间隔 {poll_seconds} 秒")
+                # 切换期间的写入无法确定具体路径，所有仓库都重新检查一次
+                now = time.time()
+                for repo_path in repo_paths:
+                    pending.setdefault(repo_path, [now, now, None])[2] = None
+                continue
+            for repo_path, rel_path in events:
+                if rel_path is not None and is_path_ignored(rel_path, watcher.ignored[repo_path]):
+                    continue
+                now = time.time()
+                state = pending.setdefault(repo_path, [now, now, set()])
+                state[1] = now
+                if rel_path is None or state[2] is None or len(state[2]) >= MAX_PENDING_PATHS:
+                    state[2] = None
+                else:
+                    state[2].add(rel_path)
+            
+            for repo_path, future in list(running.items()):
+                if future.done():
+                    del running[repo_path]
+            
+            now = time.time()
+            batch = get_batch_policy(config)
+            for repo_path in repo_paths if batch else ():
+                deadline = batch_deadline(repo_path, batch)
+                if deadline and deadline <= now and repo_path not in pending and repo_path not in running:
+                    pending[repo_path] = [deadline, deadline - debounce, None]
+            
+            window_open = in_schedule_window(config)
+            for repo_path, (first, last, paths) in list(pending.items()):
+                if repo_path in running or not window_open:
+                    continue
+                if now - last < debounce and now - first < max_delay:
+                    continue
+                del pending[repo_path]
+                
+                if paths is not None:
+                    if any(os.path.basename(path) == '.gitignore' for path in paths):
+                        watcher.refresh_ignored(repo_path)
+                    paths -= filter_ignored_paths(repo_path, sorted(paths))
+                    if not paths:
+                        continue
+                running[repo_path] = executor.submit(push_repo, repo_path)
+    finally:
+        watcher.close()
+        # 还没有开始的推送直接取消，只等待进行中的推送
+        active = [future for future in running.values() if not future.cancel() and not future.done()]
+        if active:
+            logger.info(f"正在等待 {len(active)} 个进行中的推送完成...")
+        executor.shutdown(wait=True)
+        logger.info("监听已停止")
 
 def manual_push():
     """手动推送"""
@@ -754,24 +3424,187 @@ def manual_push():
     
     choice = input("\n请选择操作 [1-3]: ").strip()
     if choice == '1':
-        push_to_github(repo_path, force_push=False)
+        push_to_github(repo_path, force_push=False, interactive=True)
     elif choice == '2':
         confirm = input("\n警告：强制推送可能会覆盖远程仓库的更改，是否继续？(y/n): ").lower().strip()
         if confirm == 'y':
-            push_to_github(repo_path, force_push=True)
+            push_to_github(repo_path, force_push=True, interactive=True)
     
     input("\n按回车键返回主菜单...")
 
-def main():
-    # 处理命令行参数
-    if len(sys.argv) > 1 and sys.argv[1] == '--background':
-        # 后台运行模式
-        config = load_config()
-        if config.getboolean('Schedule', 'enable'):
-            interval = int(config['Schedule']['interval_minutes'])
-            schedule.every(interval).minutes.do(run_schedule)
-            schedule_thread()
-        return
+# 命令行退出码
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+
+def cli_push(args, config):
+    """push 子命令：检查并推送配置中的所有仓库（或指定的仓库）"""
+    repo_paths = [os.path.abspath(path) for path in args.repos]
+    results = push_all_repos(config, repo_paths)
+    if not results:
+        return EXIT_FAILURE
+    return EXIT_OK if all(results.values()) else EXIT_FAILURE
+
+def repo_status(repo_path):
+    """汇总仓库的分支、变更和推送状态，不修改任何内容"""
+    status = {'repo': repo_label(repo_path), 'path': repo_path, 'ok': False}
+    if not os.path.exists(os.path.join(repo_path, '.git')):
+        status['error'] = '不是Git仓库'
+        return status
+    changes = check_git_changes(repo_path)
+    if changes is None:
+        status['error'] = '读取仓库状态失败'
+        return status
+    
+    state = get_repo_state(repo_path)
+    remote_states = get_remote_states(repo_path)
+    now = time.time()
+    status.update(
+        ok=True,
+        branch=changes.branch_head,
+        upstream=changes.upstream,
+        ahead=changes.ahead,
+        behind=changes.behind,
+        changes={name: count for name, count in changes.counts().items() if count},
+        parked={remote: remote_state['parked_reason']
+                for remote, remote_state in remote_states.items() if remote_state['parked_config']},
+        backoff_until={remote: remote_state['backoff_until'] for remote, remote_state in remote_states.items()
+                       if not remote_state['parked_config'] and (remote_state['backoff_until'] or 0) > now},
+        pending_batch_commits=state['batch_commits'] or 0
+    )
+    return status
+
+def cli_status(args, config):
+    """status 子命令：输出各仓库的状态，读取失败时返回非零退出码"""
+    repo_paths = [os.path.abspath(path) for path in args.repos] or get_repo_paths(config)
+    statuses = [repo_status(path) for path in repo_paths]
+    if args.json:
+        print(json.dumps(statuses, ensure_ascii=False, indent=2))
+    else:
+        for status in statuses:
+            if not status['ok']:
+                print(f"{status['repo']}: {status['error']} ({status['path']})")
+                continue
+            line = f"{status['repo']}: {status['branch']}"
+            if status['upstream']:
+                line += f" -> {status['upstream']} (领先 {status['ahead']}, 落后 {status['behind']})"
+            changes = ', '.join(f"{name} {count}" for name, count in status['changes'].items())
+            line += f"; {changes or '没有更改'}"
+            if status['pending_batch_commits']:
+                line += f"; 待推送的批量提交 {status['pending_batch_commits']} 个"
+            for remote, reason in status['parked'].items():
+                line += f"; 推送到 {remote} 已暂停（{PUSH_ERROR_DESC.get(reason, '未知错误')}）"
+            for remote, until in status['backoff_until'].items():
+                line += f"; {remote} 退避中，{until - time.time():.0f} 秒后重试"
+            print(line)
+    return EXIT_OK if all(status['ok'] for status in statuses) else EXIT_FAILURE
+
+def cli_daemon(args, config):
+    """daemon 子命令：按 [Schedule] 的配置在前台持续运行（原 --background）"""
+    if not config.getboolean('Schedule', 'enable'):
+        logger.error("定时任务未启用，请设置 [Schedule] enable = true")
+        return EXIT_FAILURE
+    start_metrics(config)
+    if config['Schedule']['mode'] == 'watch':
+        run_watch_loop(config)
+    else:
+        schedule_loop(config)
+    return EXIT_OK
+
+def _split_config_key(key):
+    """把 Section.key 拆分为 (配置节, 配置项)，配置节本身可以包含点号"""
+    section, _, option = key.rpartition('.')
+    return section, option
+
+def cli_config(args, config):
+    """config 子命令：读取或修改配置项，键的格式为 Section.key"""
+    if args.action is None:
+        args.print_help()
+        return EXIT_USAGE
+    if args.action == 'get':
+        if config.has_section(args.key):
+            for option, value in config[args.key].items():
+                print(f"{option} = {value}")
+            return EXIT_OK
+        section, option = _split_config_key(args.key)
+        if not config.has_option(section, option):
+            logger.error(f"配置项不存在: {args.key}")
+            return EXIT_FAILURE
+        print(config[section][option])
+        return EXIT_OK
+    
+    section, option = _split_config_key(args.key)
+    if not section or not option:
+        logger.error(f"配置项格式应为 Section.key: {args.key}")
+        return EXIT_USAGE
+    if section.startswith('repo:'):
+        if not config.has_section(section):
+            config.add_section(section)
+    elif not config.has_option(section, option):
+        # 防止拼写错误写入无效的配置项；仓库专属配置节不受此限制
+        logger.error(f"配置项不存在: {args.key}")
+        return EXIT_FAILURE
+    config[section][option] = args.value
+    save_config(config)
+    return EXIT_OK
+
+def cli_check(args, config):
+    """check 子命令：检查运行环境和远程连接，全部通过时返回 0"""
+    checks = [check_python_version(), check_git_installed(), check_git_config(interactive=False)]
+    if config['Network']['probe_method'] == 'ls-remote':
+        checks += [check_github_connection(path, force=True) for path in get_repo_paths(config)]
+    else:
+        checks.append(check_github_connection(force=True))
+    return EXIT_OK if all(checks) else EXIT_FAILURE
+
+def build_arg_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog='auto_git_push.py',
+        description='Git自动推送工具，不带子命令时进入交互菜单')
+    parser.add_argument('-c', '--config', help=f'配置文件路径（默认为 {CONFIG_FILE}）')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    push_parser = subparsers.add_parser('push', help='检查并推送仓库')
+    push_parser.add_argument('repos', nargs='*', help='仓库路径，默认为配置中的所有仓库')
+    push_parser.set_defaults(handler=cli_push)
+    
+    status_parser = subparsers.add_parser('status', help='查看仓库状态')
+    status_parser.add_argument('repos', nargs='*', help='仓库路径，默认为配置中的所有仓库')
+    status_parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    status_parser.set_defaults(handler=cli_status)
+    
+    daemon_parser = subparsers.add_parser('daemon', help='按定时任务或监听模式持续运行')
+    daemon_parser.set_defaults(handler=cli_daemon)
+    
+    config_parser = subparsers.add_parser('config', help='读取或修改配置')
+    config_subparsers = config_parser.add_subparsers(dest='action')
+    get_parser = config_subparsers.add_parser('get', help='输出配置项（或整个配置节）的值')
+    get_parser.add_argument('key', help='Section.key 或 Section')
+    set_parser = config_subparsers.add_parser('set', help='修改配置项')
+    set_parser.add_argument('key', help='Section.key')
+    set_parser.add_argument('value')
+    config_parser.set_defaults(handler=cli_config, print_help=config_parser.print_help)
+    
+    check_parser = subparsers.add_parser('check', help='检查运行环境和远程连接')
+    check_parser.set_defaults(handler=cli_check)
+    return parser
+
+def main(argv=None):
+    """程序入口，返回退出码"""
+    global CONFIG_FILE
+    argv = sys.argv[1:] if argv is None else argv
+    # 兼容旧的 --background 参数
+    if argv[:1] == ['--background']:
+        argv = ['daemon'] + argv[1:]
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.config:
+        CONFIG_FILE = args.config
+    
+    setup_logging(load_config())
+    if args.command:
+        return args.handler(args, load_config())
 
     while True:
         print_menu()
@@ -797,11 +3630,8 @@ def main():
                 input("\n按回车键返回主菜单...")
                 continue
 
-            # 设置代理
-            setup_proxy()
-
             # 检查GitHub连接
-            if not check_github_connection():
+            if not check_github_connection(repo_path):
                 logger.error("无法连接到GitHub，请检查网络或代理设置")
                 input("\n按回车键返回主菜单...")
                 continue
@@ -812,7 +3642,7 @@ def main():
                 continue
 
             # 推送到GitHub
-            push_to_github(repo_path)
+            push_to_github(repo_path, interactive=True)
             input("\n按回车键返回主菜单...")
             
         elif choice == '2':
@@ -833,17 +3663,21 @@ def main():
             manual_push()
         elif choice == '10':
             print("\n感谢使用！再见！")
-            break
+            return EXIT_OK
         else:
             print("\n无效的选择，请重试！")
             time.sleep(1)
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\n\n程序已被用户中断。再见！")
+        sys.exit(130)
     except Exception as e:
         logger.error(f"发生错误: {str(e)}")
         print("\n程序发生错误，请查看日志文件了解详情。")
-        input("按回车键退出...")
+        # 只有交互菜单才等待按键，命令行调用直接以非零退出码结束
+        if len(sys.argv) == 1 and sys.stdin.isatty():
+            input("按回车键退出...")
+        sys.exit(EXIT_FAILURE)
@@ -0,0 +1,275 @@
+"""推送流程基准测试
+
+在临时目录中生成指定规模的合成仓库，以本地裸仓库作为 origin（不访问网络），
+依次施加不同类型的改动后运行一次完整的推送流程（push_repo），记录：
+
+- 各阶段耗时（来自 stage_duration_seconds 指标：precheck / check / status / add / commit / push 等）
+- 启动的子进程数，按 git 子命令分类（来自 command_observers）
+- 总耗时和推送结果
+
+结果以 JSON 输出到标准输出（或 --output 指定的文件），日志输出到标准错误，便于在不同版本之间对比。
+
+用法：
+    python benchmarks/pipeline_benchmark.py --files 10000
+    python benchmarks/pipeline_benchmark.py --files 100000 --churn modify,add --churn-ratio 0.001
+    python benchmarks/pipeline_benchmark.py --files 1000000 --binary 5 --binary-size 4096 --output result.json
+
+改动类型：
+    none     没有改动（测量预检查跳过的路径）
+    modify   修改已有文件
+    add      新增文件
+    delete   删除文件
+    rename   重命名文件
+    binary   新增二进制文件（数量和大小由 --binary / --binary-size 指定）
+    mixed    同时修改、新增、删除和重命名
+"""
+import argparse
+import configparser
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import auto_git_push  # noqa: E402
+
+CHURN_TYPES = ('none', 'modify', 'add', 'delete', 'rename', 'binary', 'mixed')
+
+
+def git(*args, cwd=None):
+    subprocess.run(['git'] + list(args), cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class SyntheticRepo:
+    """合成测试仓库：files_per_dir 个文件一个目录，记录当前受跟踪的文件列表"""
+
+    def __init__(self, work_dir, files, files_per_dir, seed):
+        self.path = os.path.join(work_dir, 'repo')
+        self.origin = os.path.join(work_dir, 'origin.git')
+        self.files_per_dir = files_per_dir
+        self.random = random.Random(seed)
+        self.files = []
+        self._next_id = 0
+        self._create(files)
+
+    def _new_path(self, prefix='f'):
+        index = self._next_id
+        self._next_id += 1
+        return os.path.join(f'd{index // self.files_per_dir:05d}', f'{prefix}{index}.txt')
+
+    def _write(self, rel_path, content, mode='w'):
+        path = os.path.join(self.path, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(content)
+
+    def _create(self, files):
+        git('init', '-q', '--bare', self.origin)
+        git('init', '-q', self.path)
+        git('config', 'user.name', 'benchmark', cwd=self.path)
+        git('config', 'user.email', 'benchmark@example.com', cwd=self.path)
+        for _ in range(files):
+            rel_path = self._new_path()
+            self._write(rel_path, f'{rel_path}\n')
+            self.files.append(rel_path)
+        git('add', '-A', cwd=self.path)
+        git('commit', '-q', '-m', 'init', cwd=self.path)
+        git('branch', '-M', 'master', cwd=self.path)
+        git('remote', 'add', 'origin', self.origin, cwd=self.path)
+        git('push', '-q', '-u', 'origin', 'master', cwd=self.path)
+
+    def _sample(self, count):
+        count = min(count, len(self.files))
+        return self.random.sample(range(len(self.files)), count)
+
+    def modify(self, count):
+        for index in self._sample(count):
+            self._write(self.files[index], f'changed {time.time()}\n', mode='a')
+        return count
+
+    def add(self, count):
+        for _ in range(count):
+            rel_path = self._new_path('new')
+            self._write(rel_path, f'{rel_path}\n')
+            self.files.append(rel_path)
+        return count
+
+    def delete(self, count):
+        indexes = sorted(self._sample(count), reverse=True)
+        for index in indexes:
+            os.remove(os.path.join(self.path, self.files.pop(index)))
+        return len(indexes)
+
+    def rename(self, count):
+        for index in self._sample(count):
+            new_path = self._new_path('moved')
+            os.makedirs(os.path.dirname(os.path.join(self.path, new_path)), exist_ok=True)
+            os.rename(os.path.join(self.path, self.files[index]), os.path.join(self.path, new_path))
+            self.files[index] = new_path
+        return count
+
+    def binary(self, count, size):
+        for _ in range(count):
+            rel_path = self._new_path('blob').replace('.txt', '.bin')
+            path = os.path.join(self.path, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size))
+            self.files.append(rel_path)
+        return count
+
+    def apply(self, churn, count, binary_count, binary_size):
+        """施加一种改动，返回改动的文件数"""
+        if churn == 'none':
+            return 0
+        if churn == 'binary':
+            return self.binary(binary_count, binary_size)
+        if churn == 'mixed':
+            part = max(1, count // 4)
+            return self.modify(part) + self.add(part) + self.delete(part) + self.rename(part)
+        return getattr(self, churn)(count)
+
+
+def write_config(work_dir, repo_path):
+    """写入只包含测试仓库的配置文件"""
+    config = configparser.ConfigParser()
+    config['Git'] = {'work_dir': repo_path, 'branch': 'master'}
+    config['Repos'] = {'paths': repo_path}
+    config['Log'] = {'file': os.path.join(work_dir, 'git_push.log'), 'async': 'false'}
+    config['State'] = {'file': os.path.join(work_dir, 'git_push_state.db')}
+    path = os.path.join(work_dir, 'git_config.ini')
+    with open(path, 'w', encoding='utf-8') as f:
+        config.write(f)
+    return path
+
+
+class CommandCounter:
+    """统计启动的子进程数，git 命令按子命令分类"""
+
+    def __init__(self):
+        self.counts = {}
+
+    def __call__(self, command, code, elapsed):
+        name = command[0]
+        if name == 'git':
+            # 跳过 -c key=value 等全局参数，取实际的子命令
+            args = command[1:]
+            while args and args[0].startswith('-'):
+                args = args[2:] if args[0] == '-c' else args[1:]
+            name = f"git {args[0]}" if args else 'git'
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset(self):
+        self.counts = {}
+
+
+def reset_metrics():
+    with auto_git_push._metrics_lock:
+        auto_git_push._metrics.clear()
+        auto_git_push._histograms.clear()
+
+
+def stage_durations():
+    """从指标中取出各阶段的耗时合计（秒）"""
+    stages = {}
+    for histogram in auto_git_push.metrics_snapshot()['histograms']:
+        if histogram['name'] == 'stage_duration_seconds':
+            stage = histogram['labels']['stage']
+            stages[stage] = round(stages.get(stage, 0) + histogram['sum'], 6)
+    return stages
+
+
+def run_scenario(repo, churn, count, args, counter):
+    """施加改动并运行一次推送流程"""
+    changed = repo.apply(churn, count, args.binary, args.binary_size * 1024)
+    reset_metrics()
+    counter.reset()
+    start = time.perf_counter()
+    ok = auto_git_push.push_repo(repo.path)
+    elapsed = time.perf_counter() - start
+    return {
+        'churn': churn,
+        'changed_files': changed,
+        'ok': bool(ok),
+        'wall_seconds': round(elapsed, 6),
+        'stages': stage_durations(),
+        'subprocesses': {'total': sum(counter.counts.values()), 'by_command': dict(sorted(counter.counts.items()))},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推送流程基准测试（合成仓库 + 本地 origin）')
+    parser.add_argument('--files', type=int, default=10000, help='初始文件数（如 10000 / 100000 / 1000000）')
+    parser.add_argument('--files-per-dir', type=int, default=1000, help='每个目录的文件数')
+    parser.add_argument('--churn', default=','.join(CHURN_TYPES),
+                        help=f"逗号分隔的改动类型，按顺序执行：{', '.join(CHURN_TYPES)}")
+    parser.add_argument('--churn-ratio', type=float, default=0.01, help='每种改动涉及的文件比例')
+    parser.add_argument('--binary', type=int, default=3, help='binary 改动新增的二进制文件数')
+    parser.add_argument('--binary-size', type=int, default=1024, help='每个二进制文件的大小（KB）')
+    parser.add_argument('--repeat', type=int, default=1, help='每种改动重复的次数')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子')
+    parser.add_argument('--output', help='把 JSON 结果写入文件')
+    parser.add_argument('--keep', action='store_true', help='保留临时目录')
+    args = parser.parse_args()
+
+    churns = [churn.strip() for churn in args.churn.split(',') if churn.strip()]
+    unknown = [churn for churn in churns if churn not in CHURN_TYPES]
+    if unknown:
+        parser.error(f"未知的改动类型: {', '.join(unknown)}")
+
+    work_dir = tempfile.mkdtemp(prefix='autopush-bench-')
+    setup_start = time.perf_counter()
+    repo = SyntheticRepo(work_dir, args.files, args.files_per_dir, args.seed)
+    setup_seconds = time.perf_counter() - setup_start
+
+    auto_git_push.CONFIG_FILE = write_config(work_dir, repo.path)
+    # 日志的控制台输出写到标准输出，这里换成标准错误，标准输出只保留 JSON 结果
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        auto_git_push.setup_logging(auto_git_push.load_config())
+    finally:
+        sys.stdout = stdout
+    counter = CommandCounter()
+    auto_git_push.command_observers.append(counter)
+
+    # 第一次运行记录仓库状态，之后的 none 场景才能走预检查路径
+    auto_git_push.push_repo(repo.path)
+    count = max(1, int(args.files * args.churn_ratio))
+    scenarios = [
+        run_scenario(repo, churn, count, args, counter)
+        for churn in churns
+        for _ in range(args.repeat)
+    ]
+
+    git_version = subprocess.run(['git', '--version'], stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+    result = {
+        'python': sys.version.split()[0],
+        'git': git_version,
+        'files': args.files,
+        'files_per_dir': args.files_per_dir,
+        'churn_ratio': args.churn_ratio,
+        'setup_seconds': round(setup_seconds, 3),
+        'work_dir': work_dir if args.keep else None,
+        'scenarios': scenarios,
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if not args.keep:
+        import shutil
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0 if all(scenario['ok'] for scenario in scenarios) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""启动耗时基准测试
+
+测量两项指标：
+1. 导入 auto_git_push 的耗时（python -X importtime），并列出它直接导入的耗时最多的模块
+2. 仓库没有任何变化时，一次 `auto_git_push.py push` 的耗时（cron 单次调用的典型路径），
+   扣除空解释器（python -c pass）的启动耗时后与目标值比较，以排除不同环境中 site 的差异
+
+测试使用临时目录中的本地裸仓库作为 origin，不访问网络。
+
+用法：
+    python benchmarks/startup_benchmark.py [--runs 10] [--json] [--check]
+
+--check 时任一指标超过目标值则以退出码 1 结束。
+"""
+import argparse
+import configparser
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'auto_git_push.py')
+
+# 目标值（毫秒）：导入耗时只计 auto_git_push 及其依赖；推送耗时为扣除空解释器启动后的部分，
+# 以脚本方式运行时包含编译 auto_git_push.py 的时间（python -m 运行可以使用字节码缓存）
+TARGET_IMPORT_MS = 60
+TARGET_NOOP_PUSH_MS = 120
+
+
+def git(*args, cwd=None):
+    subprocess.run(['git'] + list(args), cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def create_repo(work_dir):
+    """创建带本地裸仓库 origin 的测试仓库"""
+    origin = os.path.join(work_dir, 'origin.git')
+    repo = os.path.join(work_dir, 'repo')
+    git('init', '-q', '--bare', origin)
+    git('init', '-q', repo)
+    git('config', 'user.name', 'benchmark', cwd=repo)
+    git('config', 'user.email', 'benchmark@example.com', cwd=repo)
+    with open(os.path.join(repo, 'README.md'), 'w', encoding='utf-8') as f:
+        f.write('benchmark\n')
+    git('add', '.', cwd=repo)
+    git('commit', '-q', '-m', 'init', cwd=repo)
+    git('branch', '-M', 'master', cwd=repo)
+    git('remote', 'add', 'origin', origin, cwd=repo)
+    git('push', '-q', '-u', 'origin', 'master', cwd=repo)
+    return repo
+
+
+def write_config(work_dir, repo):
+    """写入只包含测试仓库的配置文件"""
+    config = configparser.ConfigParser()
+    config['Git'] = {'work_dir': repo, 'branch': 'master'}
+    config['Repos'] = {'paths': repo}
+    config['Log'] = {'file': os.path.join(work_dir, 'git_push.log')}
+    config['State'] = {'file': os.path.join(work_dir, 'git_push_state.db')}
+    path = os.path.join(work_dir, 'git_config.ini')
+    with open(path, 'w', encoding='utf-8') as f:
+        config.write(f)
+    return path
+
+
+def measure_import():
+    """返回 (导入耗时毫秒, auto_git_push 直接导入的耗时最多的模块)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import auto_git_push'],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total = 0
+    children = []
+    direct = []
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if not line.startswith('import time:') or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative_us = int(parts[1])
+        name = parts[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        # importtime 先输出子模块再输出父模块，遇到顶层模块时结算它的直接子模块
+        if depth == 0:
+            if name == 'auto_git_push':
+                total = cumulative_us
+                direct = children
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), cumulative_us))
+    slowest = sorted(direct, key=lambda item: item[1], reverse=True)[:10]
+    return total / 1000, [{'module': name, 'ms': round(us / 1000, 2)} for name, us in slowest]
+
+
+def measure_command(command, runs):
+    """返回多次运行命令的耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    return {
+        'min': round(min(timings), 2),
+        'median': round(statistics.median(timings), 2),
+        'max': round(max(timings), 2),
+    }
+
+
+def measure_noop_push(config_path, runs):
+    """返回无变化推送的耗时：(脚本方式, python -m 方式)"""
+    script_command = [sys.executable, SCRIPT, '-c', config_path, 'push']
+    module_command = [sys.executable, '-m', 'auto_git_push', '-c', config_path, 'push']
+    # 第一次运行会补全配置并记录仓库状态，不计入结果
+    measure_command(script_command, 1)
+    return measure_command(script_command, runs), measure_command(module_command, runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='auto_git_push 启动耗时基准测试')
+    parser.add_argument('--runs', type=int, default=10, help='无变化推送的测量次数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    parser.add_argument('--check', action='store_true', help='超过目标值时以退出码 1 结束')
+    args = parser.parse_args()
+
+    import_ms, slowest = measure_import()
+    interpreter = statistics.median(measure_command([sys.executable, '-c', 'pass'], args.runs))
+    with tempfile.TemporaryDirectory() as work_dir:
+        repo = create_repo(work_dir)
+        script_timings, module_timings = measure_noop_push(write_config(work_dir, repo), args.runs)
+
+    result = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'interpreter_ms': round(interpreter, 2),
+        'import_ms': round(import_ms, 2),
+        'import_target_ms': TARGET_IMPORT_MS,
+        'slowest_imports': slowest,
+        'noop_push_ms': summarize(script_timings),
+        'noop_push_module_ms': summarize(module_timings),
+        'noop_push_overhead_ms': round(statistics.median(script_timings) - interpreter, 2),
+        'noop_push_target_ms': TARGET_NOOP_PUSH_MS,
+    }
+    passed = import_ms <= TARGET_IMPORT_MS and result['noop_push_overhead_ms'] <= TARGET_NOOP_PUSH_MS
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"空解释器启动: {result['interpreter_ms']} ms")
+        print(f"导入耗时: {result['import_ms']} ms（目标 {TARGET_IMPORT_MS} ms）")
+        for item in slowest:
+            print(f"  {item['module']}: {item['ms']} ms")
+        for label, key in (('脚本方式', 'noop_push_ms'), ('python -m', 'noop_push_module_ms')):
+            push = result[key]
+            print(f"无变化推送（{label}）: 中位数 {push['median']} ms，最快 {push['min']} ms，最慢 {push['max']} ms")
+        print(f"无变化推送扣除解释器启动: {result['noop_push_overhead_ms']} ms（目标 {TARGET_NOOP_PUSH_MS} ms）")
+        print('通过' if passed else '未达到目标')
+    return 0 if passed or not args.check else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())